@@ -1,24 +1,40 @@
 # Assuming you have not changed the general structure of the template no modification is needed in this file.
+import time
+
+# Start-up timing: the import of the commands is measured too, it runs before run() is called.
+_import_start = time.perf_counter()
+
 from . import commands
 from .lib import fusion360utils as futil
 
+_import_time = time.perf_counter() - _import_start
+
 
 def run(context):
     try:
+        start_time = time.perf_counter()
+
         # This will run the start function in each of your commands as defined in commands/__init__.py
         commands.start()
 
+        futil.log(f'Add-in started: import {_import_time * 1000:.1f} ms, '
+                  f'start {(time.perf_counter() - start_time) * 1000:.1f} ms')
+
     except:
         futil.handle_error('run')
 
 
 def stop(context):
     try:
+        start_time = time.perf_counter()
+
         # Remove all of the event handlers your app has created
         futil.clear_handlers()
 
         # This will run the start function in each of your commands as defined in commands/__init__.py
         commands.stop()
 
+        futil.log(f'Add-in stopped: {(time.perf_counter() - start_time) * 1000:.1f} ms')
+
     except:
-        futil.handle_error('stop')
\ No newline at end of file
+        futil.handle_error('stop')
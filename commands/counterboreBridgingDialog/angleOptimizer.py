@@ -0,0 +1,165 @@
+"""
+Bridge angle optimizer.
+
+For every face and every candidate angle, measures in one vectorized pass the length of the
+two bridge lines cutOneFace would create (the lines at distance halfWidth from the center,
+parallel to the angle, clipped by the outer boundary), visiting only the angles where a
+boundary segment crosses a line. These are the longest bridges of the first layer, the only
+ones printed over the counterbore cavity, so the best angle is the one that minimizes the
+longer of the two.
+
+Faces are the plans of planBridges (dialog.py, where their layout is documented): their
+halfWidth, outerRadius, boundary and token are read.
+"""
+
+from .optionalNumpy import np
+
+
+# Candidate angles, in degrees (bridges at a and a + 180 are the same)
+CANDIDATE_ANGLES = range(0, 180)
+
+
+def _flattenFaces(faces):
+    """
+    boundary segments of all the faces in a single (segments, 2, 2) array, with the index of
+    their face as a (segments,) array, and the half widths as a (faces,) array
+    """
+    segments = np.asarray(
+        [segment for face in faces for segment in face["boundary"]], dtype=float
+    ).reshape(-1, 2, 2)
+    owners = np.repeat(np.arange(len(faces)), [len(face["boundary"]) for face in faces])
+    halfWidths = np.asarray([face["halfWidth"] for face in faces], dtype=float)
+    return segments, owners, halfWidths
+
+
+def _crossingIntervals(segments, halfWidths):
+    """
+    for every segment, the two intervals of directions (degrees, start in [0, 360) and
+    end <= start + 360) in which it crosses the line at distance halfWidth left of the center,
+    as two (segments, 2) arrays of starts and ends.
+
+    An end point at distance r > halfWidth from the center, in the direction phi, is left of
+    that line for the directions in the arc (phi - 180 + asin(halfWidth / r), phi - asin(halfWidth / r)),
+    and never if r <= halfWidth. The segment crosses the line where exactly one of its end
+    points is left of it: between the four limits of the two arcs, in circular order, the
+    intervals alternate between crossing and not crossing.
+    """
+    x = segments[..., 0]
+    y = segments[..., 1]
+    r = np.hypot(x, y)
+    phi = np.degrees(np.arctan2(y, x))
+    outside = r > halfWidths[:, None]
+    a = np.degrees(np.arcsin(np.where(outside, halfWidths[:, None] / np.maximum(r, 1e-300), 0)))
+    starts = np.where(outside, phi - 180 + a, phi) % 360
+    ends = np.where(outside, phi - a, phi) % 360
+
+    # number of end points left of the line in the direction 0, toggled at every limit
+    parity = ((0 - starts) % 360 < (ends - starts) % 360).sum(axis=-1) % 2
+    limits = np.sort(np.concatenate([starts, ends], axis=-1), axis=-1)
+    limits = np.concatenate([limits, limits[:, :1] + 360], axis=-1)
+    first = parity[:, None] + np.array([0, 2])
+    return np.take_along_axis(limits, first, axis=-1), np.take_along_axis(limits, first + 1, axis=-1)
+
+
+def bridgeSpans(faces, angles=CANDIDATE_ANGLES):
+    """
+    returns a (faces, angles) array with, for every face and angle, the length of the longer
+    bridge line (inf if a line does not reach the boundary on both sides)
+
+    The line at -halfWidth for an angle is the line at +halfWidth for the opposite direction:
+    both lines are measured as lines left of the center, over the angles and their opposites.
+    Only the directions where a segment crosses its line are visited (see _crossingIntervals),
+    a handful per segment instead of every angle.
+    """
+    segments, owners, halfWidths = _flattenFaces(faces)
+    angles = np.asarray(angles, dtype=float)
+    directions = np.concatenate([angles, angles + 180]) % 360
+    order = np.argsort(directions)
+    grid = directions[order]
+    grid = np.concatenate([grid, grid + 360])
+
+    # directions in the crossing intervals, widened a little: the exact test below decides
+    starts, ends = _crossingIntervals(segments, halfWidths[owners])
+    lo = np.searchsorted(grid, starts.ravel() - 1e-9)
+    hi = np.searchsorted(grid, ends.ravel() + 1e-9)
+    counts = np.maximum(hi - lo, 0)
+    interval = np.repeat(np.arange(counts.size), counts)
+    rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    d = order[(lo[interval] + rank) % len(directions)]
+    m = interval // 2
+    f = owners[m]
+
+    radians = np.radians(directions[d])
+    c = np.cos(radians)
+    s = np.sin(radians)
+    (x0, y0), (x1, y1) = segments[m].transpose(1, 2, 0)
+    v0 = -x0 * s + y0 * c
+    v1 = -x1 * s + y1 * c
+    offset = halfWidths[f]
+    t0 = x0 * c + y0 * s
+    t1 = x1 * c + y1 * s
+    with np.errstate(invalid="ignore", divide="ignore"):
+        crossing = t0 + (offset - v0) * (t1 - t0) / (v1 - v0)
+    # a direction of the widened intervals where the segment does not cross is ignored (inf)
+    crossing[(v0 > offset) == (v1 > offset)] = np.inf
+
+    # the line starts from the foot of the perpendicular (t = 0), next to the hole
+    shape = (len(faces), len(directions))
+    forward = np.full(shape, np.inf)
+    backward = np.full(shape, np.inf)
+    ahead = crossing >= 0
+    np.minimum.at(forward, (f[ahead], d[ahead]), crossing[ahead])
+    np.minimum.at(backward, (f[~ahead], d[~ahead]), -crossing[~ahead])
+    spans = forward + backward
+    return np.maximum(spans[:, : len(angles)], spans[:, len(angles) :])
+
+
+def bestAngles(faces, angles=CANDIDATE_ANGLES, shared=False, cache=None):
+    """
+    returns the angle (degrees, in the frame of each face) minimizing the longest bridge.
+    With shared=True a single angle, minimizing the longest bridge over all the faces,
+    is returned for every face.
+
+    Faces with a concentric circular counterbore ("outerRadius" set) have the same bridges
+    at every angle: they are not evaluated and get None (keep the manual angle) unless a
+    shared angle is found for the other faces.
+
+    cache: optional dict kept by the caller for calls with the same angles, the spans of the
+    faces having a "token" are stored in it by (token, halfWidth) and not evaluated again.
+
+    Returns None if NumPy is not available.
+    """
+    if np is None:
+        return None
+
+    evaluated = [i for i, face in enumerate(faces) if face.get("outerRadius") is None]
+    result = [None] * len(faces)
+    if len(evaluated) == 0:
+        return result
+
+    angles = np.asarray(angles, dtype=float)
+    keys = [
+        (faces[i]["token"], faces[i]["halfWidth"])
+        if cache is not None and faces[i].get("token") is not None
+        else None
+        for i in evaluated
+    ]
+    missing = [k for k, key in enumerate(keys) if key is None or key not in cache]
+    spans = np.empty((len(evaluated), len(angles)))
+    if missing:
+        spans[missing] = bridgeSpans([faces[evaluated[k]] for k in missing], angles)
+    for k, key in enumerate(keys):
+        if key is None:
+            continue
+        if key in cache:
+            spans[k] = cache[key]
+        else:
+            cache[key] = spans[k].copy()
+
+    if shared:
+        best = float(angles[np.argmin(spans.max(axis=0))])
+        return [best] * len(faces)
+
+    for i, best in zip(evaluated, angles[np.argmin(spans, axis=1)]):
+        result[i] = float(best)
+    return result
@@ -0,0 +1,181 @@
+"""
+Bridgeability verifier.
+
+Rasterizes, layer by layer, the material of a bridged counterbore on a NumPy grid and
+reports the bridges a slicer would have to print over air: the longest unsupported span,
+the unsupported area and the area of the bridges that do not land on material at both ends.
+
+The layer stack is described by a "bridge plan", a dict filled by cutOneFace with the
+halfWidth, outerRadius and boundary of the face plan (see planBridges in dialog.py) in sketch
+space, cm and degrees, plus:
+
+    center      (x, y) of the hole
+    innerRadius radius of the hole
+    angles      direction in degrees of the bridge lines of every cut, in cut order
+
+Printed bottom up (counterbore facing the bed), layer 0 is the counterbore cavity, layer k
+(1..n) is the k-th cut, where the material is removed only inside the intersection of the
+first k strips, and layer n + 1 is the solid above the cuts, where only the hole is left.
+The new material of layer k is bridged along the direction of the k-th strip (the first
+strip again for the last layer).
+"""
+
+import math
+
+from .optionalNumpy import np
+
+
+# Side of the grid cells (cm)
+DEFAULT_CELL_SIZE = 0.01
+
+
+def _insideBoundary(x, y, coords, direction, plan):
+    """
+    counterbore region on the grid aligned with "direction" (rows along it).
+
+    Non circular boundaries are scanline-rasterized: the segments are rotated in the grid
+    frame, their crossings with every row are accumulated per column and the parity of the
+    running count gives the inside cells, O(rows * (segments + columns)).
+    """
+    cx, cy = plan["center"]
+    if plan.get("outerRadius") is not None:
+        return (x - cx) ** 2 + (y - cy) ** 2 <= plan["outerRadius"] ** 2
+
+    segments = np.asarray(plan["boundary"], dtype=float)
+    dx = segments[:, :, 0] - cx
+    dy = segments[:, :, 1] - cy
+    su = dx * math.cos(direction) + dy * math.sin(direction)
+    sv = -dx * math.sin(direction) + dy * math.cos(direction)
+    u0, u1 = su[:, 0], su[:, 1]
+    v0, v1 = sv[:, 0], sv[:, 1]
+
+    rowV = coords.reshape(-1, 1)
+    straddles = (v0 > rowV) != (v1 > rowV)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        uCross = u0 + (rowV - v0) * (u1 - u0) / (v1 - v0)
+
+    cellSize = coords[1] - coords[0]
+    rows, segment = np.nonzero(straddles)
+    columns = np.floor((uCross[rows, segment] - coords[0]) / cellSize).astype(int) + 1
+    columns = np.clip(columns, 0, len(coords))
+
+    crossings = np.zeros((len(coords), len(coords) + 1), dtype=np.int32)
+    np.add.at(crossings, (rows, columns), 1)
+    return (np.cumsum(crossings, axis=1)[:, :-1] % 2) == 1
+
+
+def _materialMask(layer, x, y, inCounterbore, inHole, plan):
+    """
+    material of the given layer at the points (x, y), see the module docstring for the layer numbering
+    """
+    cx, cy = plan["center"]
+    angles = plan["angles"]
+
+    if layer == 0:
+        removed = inCounterbore.copy()
+    elif layer <= len(angles):
+        removed = inCounterbore.copy()
+        for angle in angles[:layer]:
+            a = math.radians(angle)
+            # distance from the line through the center along the strip direction
+            distance = np.abs(-(x - cx) * math.sin(a) + (y - cy) * math.cos(a))
+            removed &= distance <= plan["halfWidth"]
+    else:
+        removed = np.zeros_like(inCounterbore)
+
+    return ~(removed | inHole)
+
+
+def _extent(plan):
+    """
+    half-size of the square grid that covers the counterbore
+    """
+    if plan.get("outerRadius") is not None:
+        return plan["outerRadius"]
+
+    cx, cy = plan["center"]
+    return max(
+        math.hypot(px - cx, py - cy) for segment in plan["boundary"] for px, py in segment
+    )
+
+
+def verifyBridgePlan(plan, cellSize=DEFAULT_CELL_SIZE):
+    """
+    rasterizes every layer of the plan and measures its unsupported regions.
+
+    Returns None if NumPy is not available, otherwise a dict with:
+        maxUnsupportedSpan  longest bridge (cm) landing on material at both ends, bands
+                            thinner than a cell along the strip edges left out
+        unsupportedArea     area (cm^2) printed over air, all layers
+        unanchoredArea      area (cm^2) of the bridges missing an anchor on at least one end
+        layers              the same values for every layer, from the bottom
+    """
+    if np is None or not plan.get("angles"):
+        return None
+
+    cx, cy = plan["center"]
+    angles = plan["angles"]
+
+    # grid aligned with the bridge direction: rows run along the bridges
+    half = _extent(plan) + 2 * cellSize
+    coords = np.arange(-half, half + cellSize, cellSize)
+    u, v = np.meshgrid(coords, coords)
+
+    layers = []
+    for layer in range(1, len(angles) + 2):
+        direction = math.radians(angles[(layer - 1) % len(angles)])
+        x = cx + u * math.cos(direction) - v * math.sin(direction)
+        y = cy + u * math.sin(direction) + v * math.cos(direction)
+
+        inCounterbore = _insideBoundary(x, y, coords, direction, plan)
+        inHole = (x - cx) ** 2 + (y - cy) ** 2 <= plan["innerRadius"] ** 2
+
+        below = _materialMask(layer - 1, x, y, inCounterbore, inHole, plan)
+        current = _materialMask(layer, x, y, inCounterbore, inHole, plan)
+        unsupported = current & ~below
+
+        # runs of unsupported cells along the rows: [start, end)
+        padded = np.pad(unsupported, ((0, 0), (1, 1))).astype(np.int8)
+        steps = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(steps == 1)
+        _rows, ends = np.nonzero(steps == -1)
+
+        width = unsupported.shape[1]
+        leftAnchor = np.zeros(len(starts), dtype=bool)
+        hasLeft = starts > 0
+        leftAnchor[hasLeft] = below[rows[hasLeft], starts[hasLeft] - 1]
+        rightAnchor = np.zeros(len(ends), dtype=bool)
+        hasRight = ends < width
+        rightAnchor[hasRight] = below[rows[hasRight], ends[hasRight]]
+        anchored = leftAnchor & rightAnchor
+
+        # a row within one cell inside the edge of a strip along the rows may only sample a
+        # band thinner than a cell (the gap between the hole and the bridge lines, in the last
+        # layer): it is seen or not depending on where the rows fall, so its runs do not count
+        # for the longest span (the areas are cell counts and keep them)
+        nearEdge = np.zeros(len(coords), dtype=bool)
+        distance = np.abs(coords)
+        for angle in angles[:layer]:
+            if abs(math.sin(math.radians(angle) - direction)) < 1e-9:
+                nearEdge |= (distance <= plan["halfWidth"]) & (
+                    distance > plan["halfWidth"] - cellSize
+                )
+        counted = ~nearEdge[rows]
+
+        lengths = ends - starts
+        layers.append(
+            {
+                "maxUnsupportedSpan": float(
+                    lengths[anchored & counted].max(initial=0) * cellSize
+                ),
+                "unsupportedArea": float(np.count_nonzero(unsupported) * cellSize**2),
+                "unanchoredArea": float(lengths[~anchored].sum() * cellSize**2),
+            }
+        )
+
+    return {
+        "maxUnsupportedSpan": max(l["maxUnsupportedSpan"] for l in layers),
+        "unsupportedArea": sum(l["unsupportedArea"] for l in layers),
+        "unanchoredArea": sum(l["unanchoredArea"] for l in layers),
+        "layers": layers,
+    }
@@ -0,0 +1,1033 @@
+import math
+import threading
+import time
+
+import adsk.core
+import adsk.fusion
+
+from ... import config
+from ...lib import fusion360utils as futil
+
+from .geometryUtil import (
+    rotateVector180,
+    rotateVector,
+    movePointTo,
+    profileHasLine,
+    getProfileLineSegments,
+    getExtendedIntersectionPoints,
+    getAngleFromTwoPoints,
+    createVectorFrom2Points,
+    getCounterboreLoops,
+    projectEdges,
+    getConcentricOuterRadius,
+    getCircleChordPoints,
+    getHoleFeatureCounterboreFaces,
+    getBoundarySegments,
+    getFaceFrame,
+    getFrameDirection,
+    getLoopSegments,
+    getNativeTransform,
+    groupFacesByComponent,
+)
+from . import angleOptimizer
+from . import bridgeVerifier
+from . import geometryCapture
+from . import interference
+from . import optionalNumpy
+from .entry import CMD_ID
+from .i18n import _
+
+app = adsk.core.Application.get()
+ui = app.userInterface
+userLanguage = app.preferences.generalPreferences.userLanguage
+
+CMD_NAME = _("Counterbore Bridging", userLanguage)
+
+# Names of the user parameters created when "Link to user parameters" is checked.
+# Every bridged counterbore references the same parameters, so editing one of them
+# in the Parameters dialog recomputes all bridges in place.
+ANGLE_PARAMETER_NAME = "cbb_angle"
+ANGLE_STEP_PARAMETER_NAME = "cbb_angle_step"
+GAP_PARAMETER_NAME = "cbb_gap"
+
+# Indexes of the items of the angle mode drop down
+ANGLE_MODE_MANUAL = 0
+ANGLE_MODE_AUTO = 1
+ANGLE_MODE_AUTO_SHARED = 2
+
+# Minimum distance (cm) between the bridges of different counterbores
+INTERFERENCE_CLEARANCE = 0.04
+
+# Default gap left between the inner diameter and the bridge lines (cm)
+DEFAULT_GAP = 0.0001
+
+# Local list of event handlers used to maintain a reference so
+# they are not released and garbage collected.
+local_handlers = []
+
+# Per-face classification (entityToken -> is a valid counterbore face) shared by the
+# preSelect and validateInputs handlers, so hovering and validating a face costs O(1)
+# after its first check. Cleared when the command terminates since the model may change.
+face_classification_cache = {}
+
+# Bridge spans of the evaluated faces by (entityToken, halfWidth), see angleOptimizer.bestAngles:
+# planBridges runs again on every settled preview, a face is only evaluated on the first one.
+# Cleared with face_classification_cache.
+bridge_spans_cache = {}
+
+# Counterbore faces of the hole features (active component entityToken -> face entityTokens):
+# the scan of getHoleFeatureCounterboreFaces runs once per command session instead of on every
+# input change. Cleared with face_classification_cache.
+hole_face_cache = {}
+
+# Preview debouncing: every input change restarts a timer and only the first
+# PREVIEW_INITIAL_FACES faces are previewed until no change happened for
+# PREVIEW_DEBOUNCE_SECONDS. The timer thread cannot touch the API, so it fires a
+# custom event which asks Fusion for the full preview from the main thread. With at most
+# PREVIEW_INITIAL_FACES faces the first preview is already the full one, no timer is started.
+PREVIEW_EVENT_ID = f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_previewSettled"
+PREVIEW_DEBOUNCE_SECONDS = 0.3
+PREVIEW_INITIAL_FACES = 3
+preview_state = {"command": None, "timer": None, "generation": 0, "settled": True}
+
+
+def isCounterboreFace(face: adsk.fusion.BRepFace):
+    """
+    cached check that the face is planar, has an inner circular loop and a bounded outer loop
+    """
+    token = face.entityToken
+    valid = face_classification_cache.get(token)
+    if valid is None:
+        valid = getCounterboreLoops(face) is not None
+        face_classification_cache[token] = valid
+    return valid
+
+
+def getHoleFaces(design: adsk.fusion.Design):
+    """
+    counterbore faces of the hole features of the active component, scanned on the first call
+    of the session and found again from their entityTokens afterwards (rescanned if one is gone)
+    """
+    component = design.activeComponent
+    tokens = hole_face_cache.get(component.entityToken)
+    if tokens is not None:
+        found = [design.findEntityByToken(token) for token in tokens]
+        if all(len(entities) > 0 for entities in found):
+            return [entities[0] for entities in found]
+
+    faces = getHoleFeatureCounterboreFaces(component)
+    hole_face_cache[component.entityToken] = [face.entityToken for face in faces]
+    return faces
+
+
+def getUserParameter(
+    design: adsk.fusion.Design, name, expression, units, comment=""
+):
+    """
+    returns a user parameter holding the value of "expression": "name" if it is missing (it is
+    created) or already has that value, otherwise the first "name_<n>" missing or with that value.
+    Existing parameters are never reassigned, the bridges made by earlier runs reference them.
+    """
+    value = design.unitsManager.evaluateExpression(expression, units)
+    candidate = name
+    n = 1
+    while True:
+        parameter = design.userParameters.itemByName(candidate)
+        if parameter is None:
+            if candidate != name:
+                futil.log(f"{CMD_NAME} {name} has another value, {candidate} is used")
+            return design.userParameters.add(
+                candidate, adsk.core.ValueInput.createByString(expression), units, comment
+            )
+        if abs(parameter.value - value) < 0.000000001:
+            return parameter
+        n += 1
+        candidate = f"{name}_{n}"
+
+
+def cutOneFace(
+    face,
+    layer_height_input: adsk.core.ValueCommandInput,
+    angleStep=0,
+    gap=DEFAULT_GAP,
+    oldGuideLine=None,
+    angleParameter=None,
+    gapParameter=None,
+    bridgePlan=None,
+    bridgeDirection=None,
+    capture=None,
+):
+    """
+    performs a cut with the specified parameters
+    a "gap" is left between the diameter and the line to make it easier to cut the patterns
+
+    face must be a native face (see getNativeFace): the sketch and the extrude are created in
+    its own component, so every occurrence of the component gets the cut.
+
+    angleParameter / gapParameter: optional names of user parameters driving the angle
+    (absolute for the first cut, relative to oldGuideLine afterwards) and the gap.
+    When given, the dimensions reference them by expression instead of holding fixed values.
+
+    bridgePlan: optional dict (see bridgeVerifier) filled with the geometry of the cut,
+    so the layer stack can be verified without reading it back from the model.
+
+    bridgeDirection: optional direction of the first cut in the space of the face component, used
+    instead of angleStep (angleStep must then be the angle of that direction in the face frame,
+    see planBridges)
+
+    capture: optional face record of a geometryCapture, the geometry read by the cut is added to its cuts
+
+    Returns the end face of the cut and its guide line, or None (after a message box) if the
+    face cannot be cut.
+    """
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+
+    # Read the inner circle and the outer boundary from the face loops
+    # (invalid faces are rejected here, before anything is created)
+    counterboreLoops = getCounterboreLoops(face)
+    if counterboreLoops is None:
+        ui.messageBox(_("Cannot find inner circle", userLanguage))
+        return
+    innerLoop, outerLoop, innerCenter, innerRadius = counterboreLoops
+
+    # plain hole-feature counterbores (outer circle concentric with the hole) get the
+    # closed-form chord computation instead of the generic intersection search
+    outerRadius = getConcentricOuterRadius(outerLoop, innerCenter)
+
+    # Create sketch on face, without projecting its edges
+    component = face.body.parentComponent
+    sks = component.sketches
+    sk: adsk.fusion.Sketch = sks.addWithoutEdges(face)
+
+    mirroredFrame = False
+    if oldGuideLine:
+        # copy it into the current sketch
+        # take the size of the angle
+
+        proj = sk.project(oldGuideLine)
+        oldGuideLine_proj: adsk.fusion.SketchLine = proj.item(0)
+        oldGuideLine_proj.isConstruction = True
+
+        # old fixed method
+        # leg_x = oldGuideLine_proj.endSketchPoint.geometry.x - oldGuideLine_proj.startSketchPoint.geometry.x
+        # leg_y = oldGuideLine_proj.endSketchPoint.geometry.y - oldGuideLine_proj.startSketchPoint.geometry.y
+        # angle = math.atan2(leg_y, leg_x) * 180 /math.pi
+
+        angleOldGuideLine = getAngleFromTwoPoints(
+            oldGuideLine_proj.startSketchPoint.geometry,
+            oldGuideLine_proj.endSketchPoint.geometry,
+        )
+        newAngle = angleOldGuideLine + angleStep
+    elif bridgeDirection is not None:
+        # whether the sketch frame is mirrored with respect to the face frame (see getFaceFrame),
+        # whose y direction comes from the face normal: angles then run the opposite way
+        mirroredFrame = (
+            sk.xDirection.crossProduct(sk.yDirection).dotProduct(face.geometry.normal) < 0
+        )
+        directionTip = innerCenter.copy()
+        directionTip.translateBy(bridgeDirection)
+        newAngle = getAngleFromTwoPoints(
+            sk.modelToSketchSpace(innerCenter), sk.modelToSketchSpace(directionTip)
+        )
+    else:
+        newAngle = angleStep
+    if not oldGuideLine:
+        # bridges at a and a + 180 are the same, the first guide line is kept in [0, 180)
+        newAngle = newAngle % 180
+
+    # project only the inner circle (as construction, it is just the reference for the center)
+    # and the outer boundary, which is the only thing the lines are intersected with
+    innerCurves = projectEdges(sk, innerLoop.edges)
+    for c in innerCurves:
+        c.isConstruction = True
+    inner = innerCurves[0]
+    lines = projectEdges(sk, outerLoop.edges)
+
+    xi = inner.centerSketchPoint.geometry.x
+    yi = inner.centerSketchPoint.geometry.y
+    zi = inner.centerSketchPoint.geometry.z
+
+    # Calculate the coordinates of the end point ( create a very short line since it will only serve as a reference for orientation )
+    angle_radians = math.radians(newAngle)
+    x_end = math.cos(angle_radians) * 0.1
+    y_end = math.sin(angle_radians) * 0.1
+    start_point = adsk.core.Point3D.create(xi, yi, zi)
+    end_point = adsk.core.Point3D.create(
+        start_point.x + x_end, start_point.y + y_end, start_point.z
+    )
+    angleGuideLine = sk.sketchCurves.sketchLines.addByTwoPoints(start_point, end_point)
+    angleGuideLine.isConstruction = True
+    sk.geometricConstraints.addCoincident(
+        angleGuideLine.startSketchPoint, inner.centerSketchPoint
+    )
+    if oldGuideLine:
+        ad = sk.sketchDimensions.addAngularDimension(
+            oldGuideLine_proj, angleGuideLine, oldGuideLine_proj.geometry.startPoint
+        )
+        ad.parameter.value = math.radians(angleStep)
+        if angleParameter:
+            ad.parameter.expression = angleParameter
+    elif angleParameter:
+        # dimension the guide line against a fixed reference perpendicular to it (an angular
+        # dimension cannot be created between parallel lines): the dimension starts at 90 deg,
+        # so the parameter can later be edited by up to 90 deg either way
+        refRadians = angle_radians - math.pi / 2
+        refLine = sk.sketchCurves.sketchLines.addByTwoPoints(
+            start_point,
+            adsk.core.Point3D.create(
+                start_point.x + math.cos(refRadians) * 0.1,
+                start_point.y + math.sin(refRadians) * 0.1,
+                start_point.z,
+            ),
+        )
+        refLine.isConstruction = True
+        refLine.isFixed = True
+        # the text point on the bisector selects the quadrant between the two lines
+        textPoint = adsk.core.Point3D.create(
+            start_point.x + (math.cos(refRadians) + x_end / 0.1) * 0.05,
+            start_point.y + (math.sin(refRadians) + y_end / 0.1) * 0.05,
+            start_point.z,
+        )
+        ad = sk.sketchDimensions.addAngularDimension(refLine, angleGuideLine, textPoint)
+        ad.parameter.value = math.pi / 2
+        # the parameter (angleStep) is measured in the face frame, which may be rotated or
+        # mirrored with respect to the sketch: the expression evaluates to 90 deg for the
+        # current value and follows the parameter in the right direction
+        if mirroredFrame:
+            ad.parameter.expression = f"({90 + angleStep} deg) - {angleParameter}"
+        else:
+            ad.parameter.expression = f"{angleParameter} + ({90 - angleStep} deg)"
+    else:
+        angleGuideLine.isFixed = True
+
+    # create the first line with the related constraints
+    # (I use a vect to move the vertex points of the lines by certain dimensions)
+    line1 = sk.sketchCurves.sketchLines.addByTwoPoints(
+        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
+    )
+    sk.geometricConstraints.addParallel(line1, angleGuideLine)
+    vect = createVectorFrom2Points(
+        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
+    )
+    rotateVector(vect, "z", 90)
+    vect.normalize()
+    vect.scaleBy(innerRadius + gap)
+    line1.endSketchPoint.move(vect)
+
+    # create the second line with the related constraints
+    line2 = sk.sketchCurves.sketchLines.addByTwoPoints(
+        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
+    )
+    sk.geometricConstraints.addParallel(line2, angleGuideLine)
+    rotateVector180(vect)
+    line2.endSketchPoint.move(vect)
+
+    # create construction lines to set the distance between the line and the internal diameter
+    # for line1
+    distanceLine = sk.sketchCurves.sketchLines.addByTwoPoints(
+        inner.centerSketchPoint.geometry, line1.endSketchPoint.geometry
+    )
+    distanceLine.isConstruction = True
+    sk.geometricConstraints.addPerpendicular(distanceLine, line1)
+    sk.geometricConstraints.addCoincident(
+        inner.centerSketchPoint, distanceLine.startSketchPoint
+    )
+    sk.geometricConstraints.addCoincident(distanceLine.endSketchPoint, line1)
+    dim = sk.sketchDimensions.addDistanceDimension(
+        distanceLine.startSketchPoint,
+        distanceLine.endSketchPoint,
+        adsk.fusion.DimensionOrientations.AlignedDimensionOrientation,
+        distanceLine.startSketchPoint.geometry,
+    )
+    dim.parameter.value = innerRadius + gap
+    if gapParameter:
+        dim.parameter.expression = f"{innerRadius} cm + {gapParameter}"
+
+    # for line2
+    distanceLine = sk.sketchCurves.sketchLines.addByTwoPoints(
+        inner.centerSketchPoint.geometry, line2.endSketchPoint.geometry
+    )
+    distanceLine.isConstruction = True
+    sk.geometricConstraints.addPerpendicular(distanceLine, line2)
+    sk.geometricConstraints.addCoincident(
+        inner.centerSketchPoint, distanceLine.startSketchPoint
+    )
+    sk.geometricConstraints.addCoincident(distanceLine.endSketchPoint, line2)
+    dim = sk.sketchDimensions.addDistanceDimension(
+        distanceLine.startSketchPoint,
+        distanceLine.endSketchPoint,
+        adsk.fusion.DimensionOrientations.AlignedDimensionOrientation,
+        distanceLine.startSketchPoint.geometry,
+    )
+    dim.parameter.value = innerRadius + gap
+    if gapParameter:
+        dim.parameter.expression = f"{innerRadius} cm + {gapParameter}"
+
+    # retrieve the intersections of the 2 lines with the existing profile
+    # when capturing, concentric cuts run the generic path too and both paths are timed,
+    # intersectWithCurve included, so their per cut cost can be compared (see replayCapture)
+    cutRecord = {"seconds": {}} if capture is not None else None
+    chords = None
+    if outerRadius is not None:
+        records = ({}, {}) if cutRecord is not None else (None, None)
+        startTime = time.perf_counter()
+        chord1 = getCircleChordPoints(
+            line1, inner.centerSketchPoint.geometry, outerRadius, lines, records[0]
+        )
+        chord2 = getCircleChordPoints(
+            line2, inner.centerSketchPoint.geometry, outerRadius, lines, records[1]
+        )
+        if cutRecord is not None:
+            cutRecord["seconds"]["closedForm"] = time.perf_counter() - startTime
+            cutRecord["closedForm"] = list(records)
+        if chord1 is not None and chord2 is not None:
+            chords = (chord1, chord2)
+    if chords is None or cutRecord is not None:
+        records = ({}, {}) if cutRecord is not None else (None, None)
+        startTime = time.perf_counter()
+        genericChords = (
+            getExtendedIntersectionPoints(line1, lines, records[0]),
+            getExtendedIntersectionPoints(line2, lines, records[1]),
+        )
+        if cutRecord is not None:
+            cutRecord["seconds"]["generic"] = time.perf_counter() - startTime
+            cutRecord["generic"] = list(records)
+        if chords is None:
+            chords = genericChords
+    (startPoint1, endPoint1, interLineStart1, interLineEnd1), (
+        startPoint2,
+        endPoint2,
+        interLineStart2,
+        interLineEnd2,
+    ) = chords
+
+    # move the lines as close to the intersection points as possible
+    movePointTo(line1.startSketchPoint, startPoint1)
+    movePointTo(line1.endSketchPoint, endPoint1)
+
+    movePointTo(line2.startSketchPoint, startPoint2)
+    movePointTo(line2.endSketchPoint, endPoint2)
+
+    # add the coincidence constraint (if it is not placed, it can cause problems on the splines)
+    sk.geometricConstraints.addCoincident(line1.startSketchPoint, interLineStart1)
+    sk.geometricConstraints.addCoincident(line1.endSketchPoint, interLineEnd1)
+
+    sk.geometricConstraints.addCoincident(line2.startSketchPoint, interLineStart2)
+    sk.geometricConstraints.addCoincident(line2.endSketchPoint, interLineEnd2)
+
+    if bridgePlan is not None:
+        if not oldGuideLine:
+            bridgePlan.update(
+                center=(xi, yi),
+                innerRadius=innerRadius,
+                halfWidth=innerRadius + gap,
+                outerRadius=outerRadius,
+                boundary=getBoundarySegments(lines) if outerRadius is None else None,
+                angles=[],
+            )
+        guideLineAngle = getAngleFromTwoPoints(
+            angleGuideLine.startSketchPoint.geometry,
+            angleGuideLine.endSketchPoint.geometry,
+        )
+        if oldGuideLine:
+            # every cut has its own sketch: keep the angles in the frame of the first one
+            guideLineAngle = bridgePlan["angles"][-1] + (
+                guideLineAngle - angleOldGuideLine
+            )
+        bridgePlan["angles"].append(guideLineAngle)
+
+    # Take the center profile
+
+    # search all profiles for those that contain both line1 and line2
+    # if a profile contains both it means it is the central one
+    # (the line segments of every profile are read once for both lines)
+    profiles = [sk.profiles.item(i) for i in range(sk.profiles.count)]
+    profileSegments = [getProfileLineSegments(p) for p in profiles]
+
+    candidateProfiles = []
+    for p, segments in zip(profiles, profileSegments):
+        if profileHasLine(p, line1.geometry, segments) and profileHasLine(
+            p, line2.geometry, segments
+        ):
+            candidateProfiles.append(p)
+
+    if cutRecord is not None:
+        cutRecord.update(
+            lines=[
+                [line.geometry.startPoint.asArray(), line.geometry.endPoint.asArray()]
+                for line in (line1, line2)
+            ],
+            profiles=profileSegments,
+            candidateProfiles=[profiles.index(p) for p in candidateProfiles],
+        )
+        capture["cuts"].append(cutRecord)
+
+    # if found more "valid" profiles... exceptional case...
+    if len(candidateProfiles) != 1:
+        ui.messageBox(_("Invalid shape, cant compute the inner profile", userLanguage))
+        return
+
+    centerProfile = adsk.core.ObjectCollection.create()
+    centerProfile.add(candidateProfiles[0])
+
+    # make the cut
+    one_lh = adsk.core.ValueInput.createByReal(-layer_height_input.value)
+
+    extrudes = component.features.extrudeFeatures
+    ex1 = extrudes.addSimple(
+        centerProfile, one_lh, adsk.fusion.FeatureOperations.CutFeatureOperation
+    )
+
+    # If a user parameter is used as input, link extrude extent to that parameter
+    if design.userParameters.itemByName(layer_height_input.expression) is not None:
+        ex1_def = adsk.fusion.DistanceExtentDefinition.cast(ex1.extentOne)
+        ex1_def.distance.expression = f"-{layer_height_input.expression}"
+
+    # return the new face (for the next cut) and the guide line for orientation
+    return ex1.endFaces[0], angleGuideLine
+
+
+# Function that is called when a user clicks the corresponding button in the UI.
+# This defines the contents of the command dialog and connects to the command related events.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    # General logging for debug.
+    futil.log(f"{CMD_NAME} Command Created Event")
+    futil.start_memory_session(CMD_ID)
+
+    # https://help.autodesk.com/view/fusion360/ENU/?contextId=CommandInputs
+    inputs = args.command.commandInputs
+
+    f_in = inputs.addSelectionInput(
+        "face_input",
+        _("Counterbore Face", userLanguage),
+        _("Select the counterbore bottom face.", userLanguage),
+    )
+    f_in.addSelectionFilter(adsk.core.SelectionCommandInput.SolidFaces)
+    f_in.setSelectionLimits(1)
+
+    hole_features_input = inputs.addBoolValueInput(
+        "hole_features_input", _("All counterbore holes", userLanguage), True, "", False
+    )
+    hole_features_input.tooltip = _(
+        "Bridge every counterbore created with the Hole command in the active component instead of picking faces.",
+        userLanguage,
+    )
+
+    angle_mode_input = inputs.addDropDownCommandInput(
+        "angle_mode_input",
+        _("Angle mode", userLanguage),
+        adsk.core.DropDownStyles.TextListDropDownStyle,
+    )
+    angle_mode_input.listItems.add(_("Manual", userLanguage), True)
+    angle_mode_input.listItems.add(_("Auto (per face)", userLanguage), False)
+    angle_mode_input.listItems.add(_("Auto (shared)", userLanguage), False)
+
+    inputs.addIntegerSpinnerCommandInput(
+        "angle_degree_input", _("Angle degree", userLanguage), 0, 359, 1, 0
+    )
+    inputs.addValueInput(
+        "layer_height_input",
+        _("Layer height", userLanguage),
+        app.activeProduct.unitsManager.defaultLengthUnits,
+        adsk.core.ValueInput.createByString("0.2 mm"),
+    )
+    inputs.addIntegerSpinnerCommandInput(
+        "number_of_cut", _("Number of cut", userLanguage), 1, 5, 1, 2
+    )
+    link_input = inputs.addBoolValueInput(
+        "link_parameters_input", _("Link to user parameters", userLanguage), True, "", False
+    )
+    link_input.tooltip = _(
+        "Drive the angle, angle step and gap through user parameters so they can be edited later.",
+        userLanguage,
+    )
+
+    futil.add_handler(
+        args.command.execute, command_execute, local_handlers=local_handlers
+    )
+    preview_state.update(command=args.command, timer=None, settled=True)
+    futil.add_handler(
+        app.registerCustomEvent(PREVIEW_EVENT_ID),
+        preview_settled,
+        local_handlers=local_handlers,
+    )
+    futil.add_handler(
+        args.command.inputChanged, command_input_changed, local_handlers=local_handlers
+    )
+    futil.add_handler(
+        args.command.executePreview, command_preview, local_handlers=local_handlers
+    )
+    futil.add_handler(
+        args.command.preSelect, command_pre_select, local_handlers=local_handlers
+    )
+    futil.add_handler(
+        args.command.validateInputs,
+        command_validate_input,
+        local_handlers=local_handlers,
+    )
+    futil.add_handler(
+        args.command.destroy, command_destroy, local_handlers=local_handlers
+    )
+
+
+# This event handler is called when the user clicks the OK button in the command dialog or
+# is immediately called after the created event not command inputs were created for the dialog.
+def command_execute(args: adsk.core.CommandEventArgs):
+    # General logging for debug.
+    futil.log(f"{CMD_NAME} Command Execute Event")
+
+    capture = geometryCapture.GeometryCapture() if config.GEOMETRY_CAPTURE else None
+    bridgePlans = bridgeFaces(
+        args.command.commandInputs, checkInterferences=True, capture=capture
+    )
+    verifyBridgePlans(bridgePlans)
+    if capture is not None:
+        path = capture.save(config.GEOMETRY_CAPTURE_FOLDER)
+        futil.log(f"{CMD_NAME} geometry captured in {path}")
+
+
+def verifyBridgePlans(bridgePlans):
+    """
+    rasterizes the layer stack of every bridged face and logs its unsupported spans and areas
+    """
+    if not optionalNumpy.isAvailable():
+        futil.log(f"{CMD_NAME} NumPy is not available, bridges are not verified")
+        return
+
+    startTime = time.perf_counter()
+    for bridgePlan in bridgePlans:
+        report = bridgeVerifier.verifyBridgePlan(bridgePlan)
+        if report is None:
+            continue
+        futil.log(
+            f"{CMD_NAME} face {bridgePlan['selectionIndex']}: max unsupported span {report['maxUnsupportedSpan'] * 10:.2f} mm, "
+            f"unsupported area {report['unsupportedArea'] * 100:.2f} mm², "
+            f"unanchored area {report['unanchoredArea'] * 100:.2f} mm²"
+        )
+    futil.log(
+        f"{CMD_NAME} verified {len(bridgePlans)} faces in "
+        f"{(time.perf_counter() - startTime) * 1000:.1f} ms"
+    )
+
+
+def bridgeFaces(
+    inputs: adsk.core.CommandInputs, maxFaces=None, checkInterferences=False, capture=None
+):
+    """
+    bridges the counterbore faces described by the command inputs.
+    maxFaces limits the work to the first faces (used by the progressive preview)
+    checkInterferences asks the user to confirm before creating bridges that run into
+    the bridges of a neighbouring counterbore
+    capture: optional geometryCapture.GeometryCapture recording the settings and the geometry read
+    """
+    # Get a reference to your command's inputs.
+    face_input: adsk.core.SelectionCommandInput = inputs.itemById("face_input")
+    angle_degree_input = inputs.itemById("angle_degree_input")
+    layer_height_input: adsk.core.ValueCommandInput = inputs.itemById(
+        "layer_height_input"
+    )
+    number_of_cut_input = inputs.itemById("number_of_cut")
+    link_parameters_input: adsk.core.BoolValueCommandInput = inputs.itemById(
+        "link_parameters_input"
+    )
+    hole_features_input: adsk.core.BoolValueCommandInput = inputs.itemById(
+        "hole_features_input"
+    )
+    angle_mode_input: adsk.core.DropDownCommandInput = inputs.itemById(
+        "angle_mode_input"
+    )
+    angleMode = angle_mode_input.selectedItem.index
+
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+
+    # Read inputs
+    if hole_features_input.value:
+        faces = getHoleFaces(design)
+    else:
+        faces = [
+            face_input.selection(i).entity for i in range(face_input.selectionCount)
+        ]
+    # layer_heigth = layer_height_input.value
+    if maxFaces is not None:
+        faces = faces[:maxFaces]
+
+    angleStep = 180.0 / number_of_cut_input.value
+
+    # an existing (maybe customised) gap parameter is reused when linking, see below
+    gap = DEFAULT_GAP
+    gapUserParameter = design.userParameters.itemByName(GAP_PARAMETER_NAME)
+    if link_parameters_input.value and gapUserParameter is not None:
+        gap = gapUserParameter.value
+
+    plans = planBridges(faces, angleMode, angle_degree_input.value, gap)
+
+    # bridges closer than the layer stack can merge with each other
+    clearance = max(
+        INTERFERENCE_CLEARANCE, number_of_cut_input.value * layer_height_input.value
+    )
+    if capture is not None:
+        capture.fixture["settings"].update(
+            angleMode=angleMode,
+            manualAngle=angle_degree_input.value,
+            numberOfCut=number_of_cut_input.value,
+            layerHeight=layer_height_input.value,
+            clearance=clearance,
+        )
+
+    if checkInterferences:
+        conflicts = findBridgeInterferences(plans, clearance)
+        if conflicts:
+            for i, j in conflicts:
+                futil.log(f"{CMD_NAME} bridges of faces {i} and {j} interfere")
+            result = ui.messageBox(
+                _("{} pairs of counterbores have interfering bridges. Create them anyway?", userLanguage).format(len(conflicts)),
+                CMD_NAME,
+                adsk.core.MessageBoxButtonTypes.YesNoButtonType,
+                adsk.core.MessageBoxIconTypes.WarningIconType,
+            )
+            if result != adsk.core.DialogResults.DialogYes:
+                return []
+
+    angleParameter = angleStepParameter = gapParameter = None
+    if link_parameters_input.value:
+        # one shared set of parameters: editing them later recomputes every bridge in place
+        # (the first angle is chosen per face in the auto modes, so only the step is linked)
+        if angleMode == ANGLE_MODE_MANUAL:
+            angleParameter = getUserParameter(
+                design, ANGLE_PARAMETER_NAME, f"{angle_degree_input.value} deg", "deg"
+            ).name
+        angleStepParameter = getUserParameter(
+            design,
+            ANGLE_STEP_PARAMETER_NAME,
+            f"180 deg / {number_of_cut_input.value}",
+            "deg",
+        ).name
+        # the gap is not an input of the command: an existing one is reused as it is
+        if gapUserParameter is None:
+            gapUserParameter = getUserParameter(
+                design, GAP_PARAMETER_NAME, f"{DEFAULT_GAP} cm", "mm"
+            )
+        gapParameter = gapUserParameter.name
+
+    # faces are planned and checked in the assembly context they were selected in, but cut in
+    # their native component: one batch per component, each shared definition modified once
+    batches = groupFacesByComponent(faces)
+    # every selected face is captured (planning and interferences run on all of them),
+    # the other occurrences of a face already cut just have no cuts
+    faceCaptures = (
+        [capture.addFace(capturedPlan(plan)) for plan in plans]
+        if capture is not None
+        else None
+    )
+    duplicates = len(faces) - sum(len(members) for _component, members in batches)
+    if duplicates:
+        futil.log(
+            f"{CMD_NAME} {duplicates} faces belong to other occurrences of a bridged component"
+        )
+
+    bridgePlans = []
+    for component, members in batches:
+        batchStartTime = time.perf_counter()
+        for index, nativeFace in members:
+            plan = plans[index]
+            if plan is None:
+                futil.log(f"{CMD_NAME} face {index} is not a counterbore face, skipped")
+                continue
+            # the planned direction is in model space, the cut in the component one
+            bridgeDirection = plan["direction"].copy()
+            transform = getNativeTransform(faces[index])
+            if transform is not None:
+                bridgeDirection.transformBy(transform)
+            # bridge plans are in batch order, the selection index identifies the face in the logs
+            bridgePlan = {"selectionIndex": index}
+            bridgePlans.append(bridgePlan)
+            faceCapture = None
+            if faceCaptures is not None:
+                faceCapture = faceCaptures[index]
+                faceCapture["bridgePlan"] = bridgePlan
+            currentFace = nativeFace
+            currentAngle = (
+                angle_degree_input.value
+            )  # la prima volta vale come l'angolo impostato, poi step
+            currentAngleParameter = angleParameter
+            oldGuideLine = None
+            for i in range(number_of_cut_input.value):
+                cut = cutOneFace(
+                    currentFace,
+                    layer_height_input,
+                    currentAngle,
+                    gap=gap,
+                    oldGuideLine=oldGuideLine,
+                    angleParameter=currentAngleParameter,
+                    gapParameter=gapParameter,
+                    bridgePlan=bridgePlan,
+                    bridgeDirection=bridgeDirection,
+                    capture=faceCapture,
+                )
+                # the face could not be cut (already reported): the next cuts would fail too
+                if cut is None:
+                    break
+                currentFace, oldGuideLine = cut
+                currentAngle = angleStep
+                currentAngleParameter = angleStepParameter
+                bridgeDirection = None
+                # app.activeViewport.refresh()
+        futil.log(
+            f"{CMD_NAME} bridged {len(members)} faces of {component.name} in "
+            f"{(time.perf_counter() - batchStartTime) * 1000:.1f} ms"
+        )
+
+    return bridgePlans
+
+
+def planBridges(faces, angleMode, manualAngle, gap=DEFAULT_GAP):
+    """
+    plans the first cut of every face before anything is created: returns for every face a
+    dict (None for invalid faces), the plan read by angleOptimizer, interference and
+    geometryCapture, and whose geometry is repeated in the bridge plans of bridgeVerifier:
+
+        frame       (origin, xDirection, yDirection) of the face plane, hole center as
+                    origin (see getFaceFrame)
+        halfWidth   distance of the bridge lines from the center (hole radius + gap)
+        outerRadius radius of a concentric circular counterbore, or None
+        boundary    [((x0, y0), (x1, y1)), ...] segments of the outer boundary in the frame,
+                    None when outerRadius is set
+        token       entityToken of the face
+        angle       direction of the first cut in the frame (degrees)
+        direction   the same direction in model space
+
+    The angle is the manual one or, in the auto modes, the one chosen by angleOptimizer to
+    minimize the longest bridge (a single angle for all the faces if shared); the manual angle
+    is kept where all angles are equivalent (concentric circular counterbores) or NumPy is missing.
+    """
+    plans = []
+    for face in faces:
+        counterboreLoops = getCounterboreLoops(face)
+        if counterboreLoops is None:
+            plans.append(None)
+            continue
+        innerLoop, outerLoop, center, radius = counterboreLoops
+        frame = getFaceFrame(face, center)
+        outerRadius = getConcentricOuterRadius(outerLoop, center)
+        plans.append(
+            {
+                "frame": frame,
+                "halfWidth": radius + gap,
+                "outerRadius": outerRadius,
+                "boundary": getLoopSegments(outerLoop, frame) if outerRadius is None else None,
+                "angle": manualAngle,
+                "token": face.entityToken,
+            }
+        )
+
+    evaluated = [plan for plan in plans if plan is not None]
+    if angleMode != ANGLE_MODE_MANUAL:
+        if not optionalNumpy.isAvailable():
+            futil.log(f"{CMD_NAME} NumPy is not available, the manual angle is used")
+        else:
+            startTime = time.perf_counter()
+            angles = angleOptimizer.bestAngles(
+                evaluated,
+                shared=angleMode == ANGLE_MODE_AUTO_SHARED,
+                cache=bridge_spans_cache,
+            )
+            futil.log(
+                f"{CMD_NAME} evaluated {len(angleOptimizer.CANDIDATE_ANGLES)} angles for "
+                f"{len(evaluated)} faces in {(time.perf_counter() - startTime) * 1000:.1f} ms"
+            )
+            for plan, angle in zip(evaluated, angles):
+                if angle is not None:
+                    plan["angle"] = angle
+
+    for plan in evaluated:
+        plan["direction"] = getFrameDirection(plan["frame"], plan["angle"])
+    return plans
+
+
+def capturedPlan(plan):
+    """
+    the plan of a face (see planBridges) in plain lists, for geometryCapture
+    """
+    if plan is None:
+        return None
+    origin, xDirection, yDirection = plan["frame"]
+    return {
+        "frame": [origin.asArray(), xDirection.asArray(), yDirection.asArray()],
+        "halfWidth": plan["halfWidth"],
+        "outerRadius": plan["outerRadius"],
+        "boundary": plan["boundary"],
+        "angle": plan["angle"],
+    }
+
+
+def findBridgeInterferences(plans, clearance):
+    """
+    the pairs of faces (indexes) whose planned first cut bridges come closer than the clearance
+    """
+    slabs = []
+    for i, plan in enumerate(plans):
+        if plan is None:
+            continue
+        origin, xDirection, yDirection = plan["frame"]
+        for chord in interference.bridgeChords(
+            plan["angle"], plan["halfWidth"], plan["outerRadius"], plan["boundary"]
+        ):
+            # back from the face frame to model space
+            points = []
+            for x, y in chord:
+                points.append(
+                    tuple(
+                        o + x * u + y * v
+                        for o, u, v in zip(
+                            origin.asArray(), xDirection.asArray(), yDirection.asArray()
+                        )
+                    )
+                )
+            slabs.append((i, points[0], points[1]))
+
+    startTime = time.perf_counter()
+    pairs = interference.findInterferences(slabs, clearance)
+    futil.log(
+        f"{CMD_NAME} checked {len(slabs)} bridges for interferences in "
+        f"{(time.perf_counter() - startTime) * 1000:.1f} ms"
+    )
+    return sorted({(slabs[i][0], slabs[j][0]) for i, j in pairs})
+
+
+# This event handler is called when the command needs to compute a new preview in the graphics window.
+def command_preview(args: adsk.core.CommandEventArgs):
+    # General logging for debug.
+    futil.log(f"{CMD_NAME} Command Preview Event")
+
+    inputs = args.command.commandInputs
+
+    # while the inputs are still changing only the first faces are previewed, so the dialog
+    # stays responsive whatever the selection size; the full preview follows once input settles
+    if preview_state["settled"]:
+        bridgeFaces(inputs)
+    else:
+        bridgeFaces(inputs, maxFaces=PREVIEW_INITIAL_FACES)
+
+
+def schedulePreview(faceCount):
+    """
+    marks the inputs as changing and (re)starts the timer that requests the full preview,
+    unless the partial preview already covers the faceCount faces
+    """
+    preview_state["generation"] += 1
+    if preview_state["timer"] is not None:
+        preview_state["timer"].cancel()
+        preview_state["timer"] = None
+    preview_state["settled"] = faceCount <= PREVIEW_INITIAL_FACES
+    if preview_state["settled"]:
+        return
+
+    timer = threading.Timer(
+        PREVIEW_DEBOUNCE_SECONDS,
+        app.fireCustomEvent,
+        (PREVIEW_EVENT_ID, str(preview_state["generation"])),
+    )
+    timer.daemon = True
+    preview_state["timer"] = timer
+    timer.start()
+
+
+# This event handler is called (on the main thread) once the inputs have not changed for
+# PREVIEW_DEBOUNCE_SECONDS; older requests are ignored since a newer change restarted the timer.
+def preview_settled(args: adsk.core.CustomEventArgs):
+    command = preview_state["command"]
+    if command is None or args.additionalInfo != str(preview_state["generation"]):
+        return
+
+    preview_state["settled"] = True
+    command.doExecutePreview()
+
+
+# This event handler is called when the user changes anything in the command dialog
+# allowing you to modify values of other inputs based on that change.
+def command_input_changed(args: adsk.core.InputChangedEventArgs):
+    changed_input = args.input
+    inputs = args.inputs
+
+    # General logging for debug.
+    futil.log(
+        f"{CMD_NAME} Input Changed Event fired from a change to {changed_input.id}"
+    )
+
+    if inputs.itemById("hole_features_input").value:
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        faceCount = len(getHoleFaces(design))
+    else:
+        faceCount = inputs.itemById("face_input").selectionCount
+    schedulePreview(faceCount)
+
+    # the angle is computed in the auto modes
+    if changed_input.id == "angle_mode_input":
+        inputs.itemById("angle_degree_input").isEnabled = (
+            changed_input.selectedItem.index == ANGLE_MODE_MANUAL
+        )
+
+    # faces are read from the hole features, picking is not needed
+    if changed_input.id == "hole_features_input":
+        face_input: adsk.core.SelectionCommandInput = inputs.itemById("face_input")
+        if changed_input.value:
+            face_input.clearSelection()
+            face_input.setSelectionLimits(0)
+        else:
+            face_input.setSelectionLimits(1)
+        face_input.isEnabled = not changed_input.value
+
+
+# This event handler is called when the user interacts with any of the inputs in the dialog
+# which allows you to verify that all of the inputs are valid and enables the OK button.
+def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
+    # General logging for debug.
+    futil.log(f"{CMD_NAME} Validate Input Event")
+
+    inputs = args.inputs
+
+    # Verify the validity of the input values. This controls if the OK button is enabled or not.
+    layer_height_input = inputs.itemById("layer_height_input")
+    face_input: adsk.core.SelectionCommandInput = inputs.itemById("face_input")
+    if layer_height_input.value < 0:
+        args.areInputsValid = False
+        return
+
+    # reject faces that would fail inside cutOneFace before any preview runs
+    for i in range(face_input.selectionCount):
+        if not isCounterboreFace(face_input.selection(i).entity):
+            args.areInputsValid = False
+            return
+
+    args.areInputsValid = True
+
+
+# This event handler is called when the user hovers over an entity while a selection input is active
+# which allows you to prevent the selection of entities that can't be used.
+def command_pre_select(args: adsk.core.SelectionEventArgs):
+    face = adsk.fusion.BRepFace.cast(args.selection.entity)
+    if face is not None and not isCounterboreFace(face):
+        args.isSelectable = False
+
+
+# This event handler is called when the command terminates.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    # General logging for debug.
+    futil.log(f"{CMD_NAME} Command Destroy Event")
+
+    if preview_state["timer"] is not None:
+        preview_state["timer"].cancel()
+    app.unregisterCustomEvent(PREVIEW_EVENT_ID)
+    preview_state.update(command=None, timer=None, settled=True)
+
+    global local_handlers
+    face_classification_cache.clear()
+    bridge_spans_cache.clear()
+    hole_face_cache.clear()
+    # release everything the command holds before the end snapshot, so that only memory
+    # retained across sessions is reported (the count of handlers is recorded first)
+    local_handler_count = len(local_handlers)
+    local_handlers = []
+    futil.end_memory_session(CMD_ID, local_handler_count=local_handler_count)
@@ -1,94 +1,16 @@
-import math
 import os
 
 import adsk.core
-import adsk.fusion
 
 from ... import config
 from ...lib import fusion360utils as futil
 
-from .geometryUtil import (
-    rotateVector180,
-    rotateVector,
-    movePointTo,
-    profileHasLine,
-    getExtendedIntersectionPoints,
-    getAngleFromTwoPoints,
-    get_curves_from_sketch,
-    createVectorFrom2Points,
-)
-
-
-app = adsk.core.Application.get()
-ui = app.userInterface
-userLanguage = app.preferences.generalPreferences.userLanguage
-
-# i18n
-# ChinesePRCLanguage = 0
-# ChineseTaiwanLanguage = 1
-# CzechLanguage = 2
-# EnglishLanguage = 3
-# FrenchLanguage = 4
-# GermanLanguage = 5
-# HungarianLanguage = 6
-# ItalianLanguage = 7
-# JapaneseLanguage = 8
-# KoreanLanguage = 9
-# PolishLanguage = 10
-# PortugueseBrazilianLanguage = 11
-# RussianLanguage = 12
-# SpanishLanguage = 13
-# TurkishLanguage = 14
-i18n = {
-    0: {
-        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "一款用于优化3D打印沉头孔的Fusion 360插件",
-        "Counterbore Bridging": "沉孔搭桥",
-        "Counterbore Face": "沉头孔面",
-        "Select the counterbore bottom face.": "请选择沉头孔底面。",
-        "Angle degree": "角度",
-        "Layer height": "层高",
-        "Number of cut": "切割次数",
-        "Invalid shape, cant compute the inner profile": "无效的形状，无法计算内部轮廓",
-        "Cannot find inner circle": "找不到内圆",
-    },
-    1: {
-        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "一款用於優化3D列印沉頭孔的Fusion 360外掛程式",
-        "Counterbore Bridging": "沉頭孔搭橋",
-        "Counterbore Face": "沉頭孔面",
-        "Select the counterbore bottom face.": "請選擇沉頭孔底面。",
-        "Angle degree": "角度",
-        "Layer height": "層高",
-        "Number of cut": "切割次數",
-        "Invalid shape, cant compute the inner profile": "無效的形狀，無法計算內部輪廓",
-        "Cannot find inner circle": "找不到內圓",
-    },
-    3: {
-        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing",
-        "Counterbore Bridging": "Counterbore Bridging",
-        "Counterbore Face": "Counterbore Face",
-        "Select the counterbore bottom face.": "Select the counterbore bottom face.",
-        "Angle degree": "Angle degree",
-        "Layer height": "Layer height",
-        "Number of cut": "Number of cut",
-        "Invalid shape, cant compute the inner profile": "Invalid shape, cant compute the inner profile",
-        "Cannot find inner circle": "Cannot find inner circle",
-    },
-}
-
-def _(text, lang=3):
-    """
-    i18n localization function: returns the localized string for `text` in `lang`.
-    Defaults to English if translation not found.
-    """
-    return i18n.get(lang, {}).get(text, i18n[3].get(text, text))
-
+# Only the metadata needed to register the button lives here. The dialog (geometry,
+# execution and their imports) is in dialog.py, imported on the first commandCreated
+# so that nothing heavy runs while Fusion is still loading.
 
 # TODO *** Specify the command identity information. ***
 CMD_ID = f"{config.COMPANY_NAME}_{config.ADDIN_NAME}_cmdDialog"
-CMD_NAME = _("Counterbore Bridging", userLanguage)
-CMD_Description = (
-    _("A Fusion 360 Add-in Command for optimizing counterbores for 3D printing", userLanguage)
-)
 
 # Specify that the command will be promoted to the panel.
 IS_PROMOTED = True
@@ -104,16 +26,21 @@ COMMAND_BESIDE_ID = "FusionMoveCommand"
 # Resource location for command icons, here we assume a sub folder in this directory named "resources".
 ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "")
 
-# Local list of event handlers used to maintain a reference so
-# they are not released and garbage collected.
-local_handlers = []
-
 
 # Executed when add-in is run.
 def start():
+    from .i18n import _
+
+    ui = adsk.core.Application.get().userInterface
+    userLanguage = adsk.core.Application.get().preferences.generalPreferences.userLanguage
+    cmd_name = _("Counterbore Bridging", userLanguage)
+    cmd_description = _(
+        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing", userLanguage
+    )
+
     # Create a command Definition.
     cmd_def = ui.commandDefinitions.addButtonDefinition(
-        CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER
+        CMD_ID, cmd_name, cmd_description, ICON_FOLDER
     )
 
     # Define an event handler for the command created event. It will be called when the button is clicked.
@@ -135,6 +62,8 @@ def start():
 
 # Executed when add-in is stopped.
 def stop():
+    ui = adsk.core.Application.get().userInterface
+
     # Get the various UI elements for this command
     workspace = ui.workspaces.itemById(WORKSPACE_ID)
     panel = workspace.toolbarPanels.itemById(PANEL_ID)
@@ -150,335 +79,9 @@ def stop():
         command_definition.deleteMe()
 
 
-def cutOneFace(
-    face,
-    layer_height_input: adsk.core.ValueCommandInput,
-    angleStep=0,
-    gap=0.0001,
-    oldGuideLine=None,
-):
-    """
-    performs a cut with the specified parameters
-    a "gap" is left between the diameter and the line to make it easier to cut the patterns
-    """
-    app = adsk.core.Application.get()
-    design = adsk.fusion.Design.cast(app.activeProduct)
-
-    # Create sketch on face
-    sks = design.activeComponent.sketches
-    sk: adsk.fusion.Sketch = sks.add(face)
-
-    if oldGuideLine:
-        # copy it into the current sketch
-        # take the size of the angle
-
-        proj = sk.project(oldGuideLine)
-        oldGuideLine_proj: adsk.fusion.SketchLine = proj.item(0)
-        oldGuideLine_proj.isConstruction = True
-
-        # old fixed method
-        # leg_x = oldGuideLine_proj.endSketchPoint.geometry.x - oldGuideLine_proj.startSketchPoint.geometry.x
-        # leg_y = oldGuideLine_proj.endSketchPoint.geometry.y - oldGuideLine_proj.startSketchPoint.geometry.y
-        # angle = math.atan2(leg_y, leg_x) * 180 /math.pi
-
-        angleOldGuideLine = getAngleFromTwoPoints(
-            oldGuideLine_proj.startSketchPoint.geometry,
-            oldGuideLine_proj.endSketchPoint.geometry,
-        )
-        newAngle = angleOldGuideLine + angleStep
-    else:
-        newAngle = angleStep
-
-    # Get inner circle
-    cs = sk.sketchCurves.sketchCircles
-    circles = [cs.item(i) for i in range(cs.count)]
-    if len(circles) == 0:
-        # it could be an arc...
-        cs = sk.sketchCurves.sketchArcs
-        circles = [cs.item(i) for i in range(cs.count)]
-        if len(circles) == 0:
-            ui.messageBox(_("Cannot find inner circle", userLanguage))
-            return
-
-    circles.sort(key=lambda c: c.radius, reverse=False)
-    inner = circles[0]
-    inner.isConstruction = True
-
-    xi = inner.centerSketchPoint.geometry.x
-    yi = inner.centerSketchPoint.geometry.y
-    zi = inner.centerSketchPoint.geometry.z
-
-    # I take all the existing lines in the sketch (before adding any more) and remove the inner circle
-    lines = get_curves_from_sketch(sk)
-    lines.remove(inner)
-
-    # Calculate the coordinates of the end point ( create a very short line since it will only serve as a reference for orientation )
-    angle_radians = math.radians(newAngle)
-    x_end = math.cos(angle_radians) * 0.1
-    y_end = math.sin(angle_radians) * 0.1
-    start_point = adsk.core.Point3D.create(xi, yi, zi)
-    end_point = adsk.core.Point3D.create(
-        start_point.x + x_end, start_point.y + y_end, start_point.z
-    )
-    angleGuideLine = sk.sketchCurves.sketchLines.addByTwoPoints(start_point, end_point)
-    angleGuideLine.isConstruction = True
-    sk.geometricConstraints.addCoincident(
-        angleGuideLine.startSketchPoint, inner.centerSketchPoint
-    )
-    if oldGuideLine:
-        ad = sk.sketchDimensions.addAngularDimension(
-            oldGuideLine_proj, angleGuideLine, oldGuideLine_proj.geometry.startPoint
-        )
-        ad.parameter.value = math.radians(angleStep)
-    else:
-        angleGuideLine.isFixed = True
-
-    # create the first line with the related constraints
-    # (I use a vect to move the vertex points of the lines by certain dimensions)
-    line1 = sk.sketchCurves.sketchLines.addByTwoPoints(
-        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
-    )
-    sk.geometricConstraints.addParallel(line1, angleGuideLine)
-    vect = createVectorFrom2Points(
-        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
-    )
-    rotateVector(vect, "z", 90)
-    vect.normalize()
-    vect.scaleBy(inner.radius + gap)
-    line1.endSketchPoint.move(vect)
-
-    # create the second line with the related constraints
-    line2 = sk.sketchCurves.sketchLines.addByTwoPoints(
-        angleGuideLine.startSketchPoint.geometry, angleGuideLine.endSketchPoint.geometry
-    )
-    sk.geometricConstraints.addParallel(line2, angleGuideLine)
-    rotateVector180(vect)
-    line2.endSketchPoint.move(vect)
-
-    # create construction lines to set the distance between the line and the internal diameter
-    # for line1
-    distanceLine = sk.sketchCurves.sketchLines.addByTwoPoints(
-        inner.centerSketchPoint.geometry, line1.endSketchPoint.geometry
-    )
-    distanceLine.isConstruction = True
-    sk.geometricConstraints.addPerpendicular(distanceLine, line1)
-    sk.geometricConstraints.addCoincident(
-        inner.centerSketchPoint, distanceLine.startSketchPoint
-    )
-    sk.geometricConstraints.addCoincident(distanceLine.endSketchPoint, line1)
-    dim = sk.sketchDimensions.addDistanceDimension(
-        distanceLine.startSketchPoint,
-        distanceLine.endSketchPoint,
-        adsk.fusion.DimensionOrientations.AlignedDimensionOrientation,
-        distanceLine.startSketchPoint.geometry,
-    )
-    dim.parameter.value = inner.radius + gap
-
-    # for line2
-    distanceLine = sk.sketchCurves.sketchLines.addByTwoPoints(
-        inner.centerSketchPoint.geometry, line2.endSketchPoint.geometry
-    )
-    distanceLine.isConstruction = True
-    sk.geometricConstraints.addPerpendicular(distanceLine, line2)
-    sk.geometricConstraints.addCoincident(
-        inner.centerSketchPoint, distanceLine.startSketchPoint
-    )
-    sk.geometricConstraints.addCoincident(distanceLine.endSketchPoint, line2)
-    dim = sk.sketchDimensions.addDistanceDimension(
-        distanceLine.startSketchPoint,
-        distanceLine.endSketchPoint,
-        adsk.fusion.DimensionOrientations.AlignedDimensionOrientation,
-        distanceLine.startSketchPoint.geometry,
-    )
-    dim.parameter.value = inner.radius + gap
-
-    # retrieve the intersections of the 2 lines with the existing profile
-    startPoint1, endPoint1, interLineStart1, interLineEnd1 = (
-        getExtendedIntersectionPoints(line1, lines)
-    )
-    startPoint2, endPoint2, interLineStart2, interLineEnd2 = (
-        getExtendedIntersectionPoints(line2, lines)
-    )
-
-    # move the lines as close to the intersection points as possible
-    movePointTo(line1.startSketchPoint, startPoint1)
-    movePointTo(line1.endSketchPoint, endPoint1)
-
-    movePointTo(line2.startSketchPoint, startPoint2)
-    movePointTo(line2.endSketchPoint, endPoint2)
-
-    # add the coincidence constraint (if it is not placed, it can cause problems on the splines)
-    sk.geometricConstraints.addCoincident(line1.startSketchPoint, interLineStart1)
-    sk.geometricConstraints.addCoincident(line1.endSketchPoint, interLineEnd1)
-
-    sk.geometricConstraints.addCoincident(line2.startSketchPoint, interLineStart2)
-    sk.geometricConstraints.addCoincident(line2.endSketchPoint, interLineEnd2)
-
-    # Take the center profile
-
-    # search all profiles for those that contain both line1 and line2
-    # if a profile contains both it means it is the central one
-    profiles = [sk.profiles.item(i) for i in range(sk.profiles.count)]
-
-    candidateProfiles = []
-    for p in profiles:
-        if profileHasLine(p, line1.geometry) and profileHasLine(p, line2.geometry):
-            candidateProfiles.append(p)
-
-    # if found more "valid" profiles... exceptional case...
-    if len(candidateProfiles) != 1:
-        ui.messageBox(_("Invalid shape, cant compute the inner profile", userLanguage))
-        return
-
-    centerProfile = adsk.core.ObjectCollection.create()
-    centerProfile.add(candidateProfiles[0])
-
-    # make the cut
-    one_lh = adsk.core.ValueInput.createByReal(-layer_height_input.value)
-
-    extrudes = design.activeComponent.features.extrudeFeatures
-    ex1 = extrudes.addSimple(
-        centerProfile, one_lh, adsk.fusion.FeatureOperations.CutFeatureOperation
-    )
-
-    # If a user parameter is used as input, link extrude extent to that parameter
-    if design.userParameters.itemByName(layer_height_input.expression) is not None:
-        ex1_def = adsk.fusion.DistanceExtentDefinition.cast(ex1.extentOne)
-        ex1_def.distance.expression = f"-{layer_height_input.expression}"
-
-    # return the new face (for the next cut) and the guide line for orientation
-    return ex1.endFaces[0], angleGuideLine
-
-
 # Function that is called when a user clicks the corresponding button in the UI.
-# This defines the contents of the command dialog and connects to the command related events.
+# The dialog module is imported here the first time, later calls reuse the loaded module.
 def command_created(args: adsk.core.CommandCreatedEventArgs):
-    # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Created Event")
-
-    # https://help.autodesk.com/view/fusion360/ENU/?contextId=CommandInputs
-    inputs = args.command.commandInputs
-
-    f_in = inputs.addSelectionInput(
-        "face_input",
-        _("Counterbore Face", userLanguage),
-        _("Select the counterbore bottom face.", userLanguage),
-    )
-    f_in.addSelectionFilter(adsk.core.SelectionCommandInput.SolidFaces)
-    f_in.setSelectionLimits(1)
-
-    inputs.addIntegerSpinnerCommandInput(
-        "angle_degree_input", _("Angle degree", userLanguage), 0, 359, 1, 0
-    )
-    inputs.addValueInput(
-        "layer_height_input",
-        _("Layer height", userLanguage),
-        app.activeProduct.unitsManager.defaultLengthUnits,
-        adsk.core.ValueInput.createByString("0.2 mm"),
-    )
-    inputs.addIntegerSpinnerCommandInput(
-        "number_of_cut", _("Number of cut", userLanguage), 1, 5, 1, 2
-    )
-
-    futil.add_handler(
-        args.command.execute, command_execute, local_handlers=local_handlers
-    )
-    futil.add_handler(
-        args.command.inputChanged, command_input_changed, local_handlers=local_handlers
-    )
-    futil.add_handler(
-        args.command.executePreview, command_preview, local_handlers=local_handlers
-    )
-    futil.add_handler(
-        args.command.validateInputs,
-        command_validate_input,
-        local_handlers=local_handlers,
-    )
-    futil.add_handler(
-        args.command.destroy, command_destroy, local_handlers=local_handlers
-    )
-
-
-# This event handler is called when the user clicks the OK button in the command dialog or
-# is immediately called after the created event not command inputs were created for the dialog.
-def command_execute(args: adsk.core.CommandEventArgs):
-    # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Execute Event")
-
-    # Get a reference to your command's inputs.
-    inputs = args.command.commandInputs
-    face_input: adsk.core.SelectionCommandInput = inputs.itemById("face_input")
-    angle_degree_input = inputs.itemById("angle_degree_input")
-    layer_height_input: adsk.core.ValueCommandInput = inputs.itemById(
-        "layer_height_input"
-    )
-    number_of_cut_input = inputs.itemById("number_of_cut")
-
-    # app = adsk.core.Application.get()
-    # design = adsk.fusion.Design.cast(app.activeProduct)
-
-    # Read inputs
-    faces = [face_input.selection(i) for i in range(face_input.selectionCount)]
-    # layer_heigth = layer_height_input.value
-
-    angleStep = 180.0 / number_of_cut_input.value
-
-    for face in faces:
-        currentFace = face.entity
-        currentAngle = (
-            angle_degree_input.value
-        )  # la prima volta vale come l'angolo impostato, poi step
-        oldGuideLine = None
-        for i in range(number_of_cut_input.value):
-            currentFace, oldGuideLine = cutOneFace(
-                currentFace, layer_height_input, currentAngle, oldGuideLine=oldGuideLine
-            )
-            currentAngle = angleStep
-            # app.activeViewport.refresh()
-
-
-# This event handler is called when the command needs to compute a new preview in the graphics window.
-def command_preview(args: adsk.core.CommandEventArgs):
-    # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Preview Event")
-
-    command_execute(args)
-
-    # inputs = args.command.commandInputs
-
-
-# This event handler is called when the user changes anything in the command dialog
-# allowing you to modify values of other inputs based on that change.
-def command_input_changed(args: adsk.core.InputChangedEventArgs):
-    changed_input = args.input
-    # inputs = args.inputs
-
-    # General logging for debug.
-    futil.log(
-        f"{CMD_NAME} Input Changed Event fired from a change to {changed_input.id}"
-    )
-
-
-# This event handler is called when the user interacts with any of the inputs in the dialog
-# which allows you to verify that all of the inputs are valid and enables the OK button.
-def command_validate_input(args: adsk.core.ValidateInputsEventArgs):
-    # General logging for debug.
-    futil.log(f"{CMD_NAME} Validate Input Event")
-
-    inputs = args.inputs
-
-    # Verify the validity of the input values. This controls if the OK button is enabled or not.
-    layer_height_input = inputs.itemById("layer_height_input")
-    if layer_height_input.value >= 0:
-        args.areInputsValid = True
-    else:
-        args.areInputsValid = False
-
-
-# This event handler is called when the command terminates.
-def command_destroy(args: adsk.core.CommandEventArgs):
-    # General logging for debug.
-    futil.log(f"{CMD_NAME} Command Destroy Event")
+    from . import dialog
 
-    global local_handlers
-    local_handlers = []
+    dialog.command_created(args)
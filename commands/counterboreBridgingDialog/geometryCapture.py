@@ -0,0 +1,60 @@
+"""
+Capture of the geometry read by the command, to profile the planning and intersection code
+outside Fusion (see tools/replayCapture.py).
+
+When GEOMETRY_CAPTURE is set in config, every execution of the command writes a fixture with
+the settings of the run and, for every face:
+
+    plan        the planned first cut (see planBridges), with its frame as plain arrays,
+                None for an invalid face. Every selected face is recorded, in selection order
+    cuts        for every cut, the inputs, the results and the time in Fusion ("seconds") of the
+                chord computations (see getExtendedIntersectionPoints and getCircleChordPoints),
+                the bridge lines and the line segments of the sketch profiles with the index of
+                the one cut. Concentric cuts run and time both paths, the closed-form one is used
+    bridgePlan  the geometry given to bridgeVerifier
+
+Everything is in plain lists and numbers (sketch or face frame coordinates, cm), and the
+fixture is gzipped JSON: a few KiB per face.
+"""
+
+import gzip
+import json
+import os
+import time
+
+# Bumped when the layout of the fixture changes
+FORMAT_VERSION = 1
+
+
+class GeometryCapture:
+    def __init__(self):
+        # settings of the run (angle mode, number of cuts, clearance...), see bridgeFaces
+        self.fixture = {"version": FORMAT_VERSION, "settings": {}, "faces": []}
+
+    def addFace(self, plan, bridgePlan=None):
+        """
+        starts the record of a face, returns it so that the cuts can be added to its "cuts".
+        bridgePlan is stored by reference, it is filled while the face is cut (it stays None
+        for a face that is not cut, i.e. another occurrence of a face already bridged)
+        """
+        face = {"plan": plan, "cuts": [], "bridgePlan": bridgePlan}
+        self.fixture["faces"].append(face)
+        return face
+
+    def save(self, folder):
+        """
+        writes the fixture in folder, returns its path
+        """
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, time.strftime("capture_%Y%m%d_%H%M%S.json.gz"))
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(self.fixture, f, separators=(",", ":"))
+        return path
+
+
+def loadFixture(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        fixture = json.load(f)
+    if fixture.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported capture version {fixture.get('version')}")
+    return fixture
@@ -3,6 +3,14 @@ import math
 import adsk.core
 import adsk.fusion
 
+from .planarGeometry import (
+    directionAngle,
+    nearestIntersections,
+    circleChord,
+    arcIndexContainingAngle,
+    segmentsContain,
+)
+
 
 def rotateVector180(vect):
     """
@@ -117,21 +125,11 @@ def extendToAnotherCurve(line : adsk.fusion.SketchLine,curveArray,start=True):
 """
 
 
-def midpoint(line: adsk.fusion.SketchLine):
-    start_point = line.startSketchPoint.geometry
-    end_point = line.endSketchPoint.geometry
-
-    mid_x = (start_point.x + end_point.x) / 2
-    mid_y = (start_point.y + end_point.y) / 2
-    mid_z = (start_point.z + end_point.z) / 2
-
-    return adsk.core.Point3D.create(mid_x, mid_y, mid_z)
-
-
-def getExtendedIntersectionPoints(line: adsk.fusion.SketchLine, curveArray):
+def getExtendedIntersectionPoints(line: adsk.fusion.SketchLine, curveArray, record=None):
     """
     given a SketchLine, it is extended and the intersection points with "curves" present in the "curveArray" are returned
 
+    record: optional dict filled with the line and the intersections found (see geometryCapture)
     """
     startIntersection = line.startSketchPoint.geometry
     endIntersection = line.endSketchPoint.geometry
@@ -141,56 +139,127 @@ def getExtendedIntersectionPoints(line: adsk.fusion.SketchLine, curveArray):
     infLine = copiedLine.asInfiniteLine()
 
     intersections = []
-    intersectionsWithLine = []
+    intersectionsWith = []
     # scroll through all the lines and find the intersections
-    for l in curveArray:  # adsk.fusion.SketchLine
+    for index, l in enumerate(curveArray):  # adsk.fusion.SketchLine
         intersectionsPoint = infLine.intersectWithCurve(l.geometry)
         for point in intersectionsPoint:
             intersections.append(point)
-            intersectionsWithLine.append({"point": point, "line": l})
+            intersectionsWith.append(index)
+
+    # I find the nearest intersections on the "start" / "end" side of the line
+    start = (startIntersection.x, startIntersection.y)
+    end = (endIntersection.x, endIntersection.y)
+    points = [(point.x, point.y) for point in intersections]
+    startIndex, endIndex = nearestIntersections(start, end, points)
+
+    if record is not None:
+        record.update(
+            line=(start, end),
+            points=points,
+            curves=intersectionsWith,
+            result=(startIndex, endIndex),
+        )
 
-    middle = midpoint(line)
+    startInteractionWith = endInteractionWith = None
+    if startIndex is not None:
+        startIntersection = intersections[startIndex]
+        startInteractionWith = curveArray[intersectionsWith[startIndex]]
 
-    # I find the direction in degrees of the direction of the line
-    startDirection = round(getAngleFromTwoPoints(startIntersection, endIntersection), 0)
+    if endIndex is not None:
+        endIntersection = intersections[endIndex]
+        endInteractionWith = curveArray[intersectionsWith[endIndex]]
 
-    # endDirection should be startDirection-180...
-    endDirection = (startDirection + 180) % 360
-    # endDirection= round(getAngleFromTwoPoints(endIntersection,startIntersection),0)
+    # return the intersections and with which lines
+    return startIntersection, endIntersection, startInteractionWith, endInteractionWith
 
-    # I find the intersections that touch the "start" / "end" side of the line
-    intersectionsWithLineStart = [
-        i
-        for i in intersectionsWithLine
-        if round(getAngleFromTwoPoints(i["point"], middle), 0) % 360 == startDirection
-    ]
-    intersectionsWithLineEnd = [
-        i
-        for i in intersectionsWithLine
-        if round(getAngleFromTwoPoints(i["point"], middle), 0) % 360 == endDirection
-    ]
 
-    # I find the nearest intersections
-    if len(intersectionsWithLineStart) > 0:
-        intersectionsWithLineStart.sort(key=lambda i: middle.distanceTo(i["point"]))
-        startIntersection = intersectionsWithLineStart[0]["point"]
-        startInteractionWith = intersectionsWithLineStart[0]["line"]
+def getConcentricOuterRadius(
+    outerLoop: adsk.fusion.BRepLoop, innerCenter: adsk.core.Point3D, tolerance=0.000001
+):
+    """
+    returns the radius of the outer loop if it is a circle (or arcs of one circle)
+    concentric with the inner circle, otherwise None
+    """
+    circle = getCircularLoopGeometry(outerLoop, tolerance)
+    if circle is None:
+        return None
 
-    if len(intersectionsWithLineEnd) > 0:
-        intersectionsWithLineEnd.sort(key=lambda i: middle.distanceTo(i["point"]))
-        endIntersection = intersectionsWithLineEnd[0]["point"]
-        endInteractionWith = intersectionsWithLineEnd[0]["line"]
+    center, radius = circle
+    if not center.isEqualToByTolerance(innerCenter, tolerance):
+        return None
+    return radius
 
-    # return the intersections and with which lines
-    return startIntersection, endIntersection, startInteractionWith, endInteractionWith
+
+def getArcAngles(curveArray, center: adsk.core.Point3D):
+    """
+    for the sketch circles/arcs of a circular boundary centred in "center", the angles of the
+    start and end points of every arc (None for a full circle). Sketch arcs always run counterclockwise.
+    """
+    arcAngles = []
+    for c in curveArray:
+        if isinstance(c, adsk.fusion.SketchArc):
+            arcAngles.append(
+                (
+                    getAngleFromTwoPoints(center, c.startSketchPoint.geometry),
+                    getAngleFromTwoPoints(center, c.endSketchPoint.geometry),
+                )
+            )
+        else:
+            arcAngles.append(None)
+    return arcAngles
+
+
+def getCircleChordPoints(
+    line: adsk.fusion.SketchLine, center: adsk.core.Point3D, radius, curveArray, record=None
+):
+    """
+    closed-form counterpart of getExtendedIntersectionPoints for a circular boundary
+    centred in "center": the line-circle intersection is computed analytically.
+
+    Returns the same tuple as getExtendedIntersectionPoints or None if the line does not
+    cross the circle or the curves it lands on cannot be identified
+
+    record: optional dict filled with the line, the circle and the arcs (see geometryCapture)
+    """
+    start = line.startSketchPoint.geometry
+    end = line.endSketchPoint.geometry
+
+    arcAngles = getArcAngles(curveArray, center)
+    if record is not None:
+        record.update(
+            line=((start.x, start.y), (end.x, end.y)),
+            center=(center.x, center.y),
+            radius=radius,
+            arcs=arcAngles,
+        )
+
+    chord = circleChord((start.x, start.y), (end.x, end.y), (center.x, center.y), radius)
+    if chord is None:
+        return None
+    (x0, y0), (x1, y1) = chord
+
+    startIntersection = adsk.core.Point3D.create(x0, y0, start.z)
+    endIntersection = adsk.core.Point3D.create(x1, y1, start.z)
+
+    centerPoint = (center.x, center.y)
+    startIndex = arcIndexContainingAngle(arcAngles, directionAngle(centerPoint, (x0, y0)))
+    endIndex = arcIndexContainingAngle(arcAngles, directionAngle(centerPoint, (x1, y1)))
+    if record is not None:
+        record["result"] = (startIndex, endIndex)
+    if startIndex is None or endIndex is None:
+        return None
+
+    return (
+        startIntersection,
+        endIntersection,
+        curveArray[startIndex],
+        curveArray[endIndex],
+    )
 
 
 def getAngleFromTwoPoints(point1: adsk.core.Point3D, point2: adsk.core.Point3D):
-    dx = point2.x - point1.x
-    dy = point2.y - point1.y
-    angolo_radianti = math.atan2(dy, dx)
-    deg = (math.degrees(angolo_radianti) + 360) % 360
-    return deg
+    return directionAngle((point1.x, point1.y), (point2.x, point2.y))
 
 
 def moveLine(line: adsk.fusion.SketchLine, vector: adsk.core.Vector3D):
@@ -201,73 +270,288 @@ def moveLine(line: adsk.fusion.SketchLine, vector: adsk.core.Vector3D):
     line.startSketchPoint.move(vector)
 
 
-def get_curves_from_sketch(sketch: adsk.fusion.Sketch):
+"""def isPointInside(profile :adsk.fusion.Profile,point:adsk.core.Point3D):
+
+    bounding_box=profile.boundingBox
+    if (bounding_box.minPoint.x <= point.x <= bounding_box.maxPoint.x and
+        bounding_box.minPoint.y <= point.y <= bounding_box.maxPoint.y):
+        return True
+    return False
+"""
+
+
+def getCircularLoopGeometry(loop: adsk.fusion.BRepLoop, tolerance=0.000001):
+    """
+    returns (center, radius) if every edge of the loop lies on the same circle
+    (a full Circle3D or several Arc3D pieces), otherwise None
     """
-    Gets all curves and lines from a sketch.
+    center = None
+    radius = None
+    for edge in loop.edges:
+        g = edge.geometry
+        if not isinstance(g, (adsk.core.Circle3D, adsk.core.Arc3D)):
+            return None
+        if center is None:
+            center = g.center
+            radius = g.radius
+        elif not center.isEqualToByTolerance(g.center, tolerance) or (
+            abs(radius - g.radius) > tolerance
+        ):
+            return None
+
+    if center is None:
+        return None
+    return center, radius
+
+
+def getCounterboreLoops(face: adsk.fusion.BRepFace):
+    """
+    reads the counterbore topology directly from the face loops, without creating a sketch.
 
-    Args:
-        sketch (adsk.fusion.Sketch): The sketch from which to obtain the curves.
+    A counterbore bottom face is planar, has a bounded outer loop (circles, arcs, lines
+    or NurbsCurve3D edges) and exactly one inner loop lying on a circle: the hole.
 
     Returns:
-        list: A list of curves and lines from the sketch.
+        (innerLoop, outerLoop, center, radius) or None if the face is not a valid counterbore face
+    """
+    if face.geometry.surfaceType != adsk.core.SurfaceTypes.PlaneSurfaceType:
+        return None
+
+    outerLoop = None
+    innerLoops = []
+    for loop in face.loops:
+        if loop.isOuter:
+            outerLoop = loop
+        else:
+            innerLoops.append(loop)
+
+    if outerLoop is None or outerLoop.edges.count == 0 or len(innerLoops) != 1:
+        return None
+
+    circle = getCircularLoopGeometry(innerLoops[0])
+    if circle is None:
+        return None
+
+    center, radius = circle
+    return innerLoops[0], outerLoop, center, radius
+
+
+def projectEdges(sketch: adsk.fusion.Sketch, edges):
+    """
+    projects the given BRepEdges into the sketch and returns the created sketch curves
     """
     curves = []
+    for edge in edges:
+        projected = sketch.project(edge)
+        for i in range(projected.count):
+            curves.append(projected.item(i))
+    return curves
 
-    # Get all curves in the sketch
-    sketchCurves = sketch.sketchCurves
 
-    for line in sketchCurves.sketchLines:
-        curves.append(line)
+def getHoleFeatureCounterboreFaces(component: adsk.fusion.Component, tolerance=0.000001):
+    """
+    returns the counterbore bottom faces of every counterbore HoleFeature in the component,
+    including the instances copied by rectangular, circular and path patterns and by mirrors
+    of those holes, nested ones too (a pattern of a mirror of a hole...). Patterns and mirrors
+    of bodies or components are not followed.
+
+    This is a filtered scan of the faces of these features: their planar faces are checked
+    against the hole and counterbore diameters read from the hole definitions (no face
+    picking and no body-wide search, but the faces are still classified geometrically).
+    """
+    features = component.features
+    holes = [
+        h
+        for h in features.holeFeatures
+        if h.holeType == adsk.fusion.HoleTypes.CounterboreHoleType
+    ]
 
-    for circle in sketchCurves.sketchCircles:
-        curves.append(circle)
+    # (feature whose faces are inspected, [(hole radius, counterbore radius), ...])
+    sources = [
+        (h, [(h.holeDiameter.value / 2, h.counterboreDiameter.value / 2)]) for h in holes
+    ]
 
-    for ellipse in sketchCurves.sketchEllipses:
-        curves.append(ellipse)
+    # features copying a source become sources too, until nothing is added (nested copies)
+    pending = [
+        f
+        for copies in (
+            features.rectangularPatternFeatures,
+            features.circularPatternFeatures,
+            features.pathPatternFeatures,
+            features.mirrorFeatures,
+        )
+        for f in copies
+    ]
+    added = True
+    while added:
+        added = False
+        for f in list(pending):
+            radii = []
+            for entity in f.inputEntities:
+                for source, sourceRadii in sources:
+                    if entity == source:
+                        radii.extend(sourceRadii)
+            if radii:
+                sources.append((f, radii))
+                pending.remove(f)
+                added = True
+
+    faces = []
+    tokens = set()
+    for feature, radii in sources:
+        for face in feature.faces:
+            if face.geometry.surfaceType != adsk.core.SurfaceTypes.PlaneSurfaceType:
+                continue
+            counterboreLoops = getCounterboreLoops(face)
+            if counterboreLoops is None:
+                continue
+            innerLoop, outerLoop, center, radius = counterboreLoops
+            outerRadius = getConcentricOuterRadius(outerLoop, center, tolerance)
+            if outerRadius is None:
+                continue
+            if not any(
+                abs(radius - holeRadius) <= tolerance
+                and abs(outerRadius - counterboreRadius) <= tolerance
+                for holeRadius, counterboreRadius in radii
+            ):
+                continue
+            if face.entityToken in tokens:
+                continue
+            tokens.add(face.entityToken)
+            faces.append(face)
+
+    return faces
+
+
+def getNativeFace(face: adsk.fusion.BRepFace):
+    """
+    the face in the space of its own component (the face itself if it is not an assembly proxy)
+    """
+    if face.assemblyContext is None:
+        return face
+    return face.nativeObject
 
-    for entity in sketchCurves.sketchArcs:
-        curves.append(entity)
 
-    for entity in sketchCurves.sketchConicCurves:
-        curves.append(entity)
+def getNativeTransform(face: adsk.fusion.BRepFace):
+    """
+    matrix bringing model space geometry into the space of the component of the face,
+    None if the face is not an assembly proxy
+    """
+    if face.assemblyContext is None:
+        return None
+    transform = face.assemblyContext.transform2.copy()
+    transform.invert()
+    return transform
 
-    for entity in sketchCurves.sketchEllipticalArcs:
-        curves.append(entity)
-    for entity in sketchCurves.sketchFittedSplines:
-        curves.append(entity)
-    for entity in sketchCurves.sketchFixedSplines:
-        curves.append(entity)
-    for entity in sketchCurves.sketchControlPointSplines:
-        curves.append(entity)
 
-    return curves
+def groupFacesByComponent(faces):
+    """
+    groups the faces (possibly assembly proxies from several occurrences) by native component.
 
+    Returns [(component, [(index, nativeFace), ...]), ...] with the components in the order of
+    their first face. A face selected in several occurrences of the same component is listed once,
+    with the index of its first selection: the component definition is modified only once.
+    """
+    batches = {}
+    tokens = set()
+    for index, face in enumerate(faces):
+        nativeFace = getNativeFace(face)
+        if nativeFace.entityToken in tokens:
+            continue
+        tokens.add(nativeFace.entityToken)
+        component = nativeFace.body.parentComponent
+        if component.id not in batches:
+            batches[component.id] = (component, [])
+        batches[component.id][1].append((index, nativeFace))
+    return list(batches.values())
+
+
+def getBoundarySegments(curveArray, tolerance=0.001):
+    """
+    tessellates the sketch curves into segments ((x0, y0), (x1, y1)) in sketch space
+    """
+    segments = []
+    for c in curveArray:
+        evaluator = c.geometry.evaluator
+        _ok, startParameter, endParameter = evaluator.getParameterExtents()
+        _ok, points = evaluator.getStrokes(startParameter, endParameter, tolerance)
+        for p0, p1 in zip(points, points[1:]):
+            segments.append(((p0.x, p0.y), (p1.x, p1.y)))
+    return segments
 
-"""def isPointInside(profile :adsk.fusion.Profile,point:adsk.core.Point3D):
 
-    bounding_box=profile.boundingBox
-    if (bounding_box.minPoint.x <= point.x <= bounding_box.maxPoint.x and
-        bounding_box.minPoint.y <= point.y <= bounding_box.maxPoint.y):
-        return True
-    return False
-"""
+def getFaceFrame(face: adsk.fusion.BRepFace, origin: adsk.core.Point3D):
+    """
+    2D frame (origin, xDirection, yDirection) on the plane of the face.
+    The x direction is the model X axis (Y if the face is normal to X) projected on the plane,
+    so faces lying on parallel planes share the same frame orientation.
+    """
+    normal = face.geometry.normal
+    reference = adsk.core.Vector3D.create(1, 0, 0)
+    if abs(normal.dotProduct(reference)) > 0.9:
+        reference = adsk.core.Vector3D.create(0, 1, 0)
+
+    xDirection = normal.copy()
+    xDirection.scaleBy(-normal.dotProduct(reference))
+    xDirection.add(reference)
+    xDirection.normalize()
+    yDirection = normal.crossProduct(xDirection)
+    return origin, xDirection, yDirection
 
 
-def profileHasLine(profile: adsk.fusion.Profile, line: adsk.core.Line3D):
+def getFrameDirection(frame, angle_degrees):
     """
-    identifies whether a given line is inside the passed profile; the vertices are checked to be equal with a small tolerance
+    model space direction of the given angle in the frame returned by getFaceFrame
+    """
+    _origin, xDirection, yDirection = frame
+    angle_radians = math.radians(angle_degrees)
+    direction = xDirection.copy()
+    direction.scaleBy(math.cos(angle_radians))
+    y = yDirection.copy()
+    y.scaleBy(math.sin(angle_radians))
+    direction.add(y)
+    return direction
+
+
+def getLoopSegments(loop: adsk.fusion.BRepLoop, frame, tolerance=0.001):
+    """
+    tessellates the loop edges into segments ((x0, y0), (x1, y1)) in the frame returned by getFaceFrame
+    """
+    origin, xDirection, yDirection = frame
+    segments = []
+    for edge in loop.edges:
+        evaluator = edge.evaluator
+        _ok, startParameter, endParameter = evaluator.getParameterExtents()
+        _ok, points = evaluator.getStrokes(startParameter, endParameter, tolerance)
+        coordinates = []
+        for p in points:
+            v = origin.vectorTo(p)
+            coordinates.append((v.dotProduct(xDirection), v.dotProduct(yDirection)))
+        segments.extend(zip(coordinates, coordinates[1:]))
+    return segments
+
+
+def getProfileLineSegments(profile: adsk.fusion.Profile):
+    """
+    the straight profile curves of the profile, as ((x, y, z), (x, y, z)) segments
     """
+    segments = []
     for profileLine in profile.profileLoops:
         for c in profileLine.profileCurves:
             if isinstance(c.geometry, adsk.core.Line3D):
                 g: adsk.core.Line3D = c.geometry
+                segments.append((tuple(g.startPoint.asArray()), tuple(g.endPoint.asArray())))
+    return segments
 
-                if g.startPoint.isEqualToByTolerance(line.startPoint, 0.000000001):
-                    if g.endPoint.isEqualToByTolerance(line.endPoint, 0.000000001):
-                        return True
 
-                elif g.startPoint.isEqualToByTolerance(line.endPoint, 0.000000001):
-                    if g.endPoint.isEqualToByTolerance(line.startPoint, 0.000000001):
-                        return True
+def profileHasLine(profile: adsk.fusion.Profile, line: adsk.core.Line3D, segments=None):
+    """
+    identifies whether a given line is inside the passed profile; the vertices are checked to be equal with a small tolerance
 
-    return False
+    segments: the profile line segments, if already read with getProfileLineSegments
+    """
+    if segments is None:
+        segments = getProfileLineSegments(profile)
+    return segmentsContain(
+        segments, tuple(line.startPoint.asArray()), tuple(line.endPoint.asArray())
+    )
@@ -0,0 +1,89 @@
+"""
+Translations of the strings of the command button and dialog, by Fusion user language.
+Only holds the tables, so that entry.start can name the button without loading the dialog.
+"""
+
+# ChinesePRCLanguage = 0
+# ChineseTaiwanLanguage = 1
+# CzechLanguage = 2
+# EnglishLanguage = 3
+# FrenchLanguage = 4
+# GermanLanguage = 5
+# HungarianLanguage = 6
+# ItalianLanguage = 7
+# JapaneseLanguage = 8
+# KoreanLanguage = 9
+# PolishLanguage = 10
+# PortugueseBrazilianLanguage = 11
+# RussianLanguage = 12
+# SpanishLanguage = 13
+# TurkishLanguage = 14
+i18n = {
+    0: {
+        "Counterbore Bridging": "沉孔搭桥",
+        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "一款用于优化3D打印沉头孔的Fusion 360插件",
+        "Counterbore Face": "沉头孔面",
+        "Select the counterbore bottom face.": "请选择沉头孔底面。",
+        "Angle degree": "角度",
+        "Layer height": "层高",
+        "Number of cut": "切割次数",
+        "Invalid shape, cant compute the inner profile": "无效的形状，无法计算内部轮廓",
+        "Cannot find inner circle": "找不到内圆",
+        "Link to user parameters": "关联到用户参数",
+        "Drive the angle, angle step and gap through user parameters so they can be edited later.": "通过用户参数驱动角度、角度步长和间隙，以便之后修改。",
+        "All counterbore holes": "所有沉头孔",
+        "Angle mode": "角度模式",
+        "Manual": "手动",
+        "Auto (per face)": "自动（逐面）",
+        "Auto (shared)": "自动（共用）",
+        "{} pairs of counterbores have interfering bridges. Create them anyway?": "有 {} 对沉头孔的搭桥相互干涉。仍然创建吗？",
+        "Bridge every counterbore created with the Hole command in the active component instead of picking faces.": "桥接当前组件中所有由孔命令创建的沉头孔，而不是手动选择面。",
+    },
+    1: {
+        "Counterbore Bridging": "沉頭孔搭橋",
+        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "一款用於優化3D列印沉頭孔的Fusion 360外掛程式",
+        "Counterbore Face": "沉頭孔面",
+        "Select the counterbore bottom face.": "請選擇沉頭孔底面。",
+        "Angle degree": "角度",
+        "Layer height": "層高",
+        "Number of cut": "切割次數",
+        "Invalid shape, cant compute the inner profile": "無效的形狀，無法計算內部輪廓",
+        "Cannot find inner circle": "找不到內圓",
+        "Link to user parameters": "連結到使用者參數",
+        "Drive the angle, angle step and gap through user parameters so they can be edited later.": "透過使用者參數驅動角度、角度步長和間隙，以便之後修改。",
+        "All counterbore holes": "所有沉頭孔",
+        "Angle mode": "角度模式",
+        "Manual": "手動",
+        "Auto (per face)": "自動（逐面）",
+        "Auto (shared)": "自動（共用）",
+        "{} pairs of counterbores have interfering bridges. Create them anyway?": "有 {} 對沉頭孔的搭橋相互干涉。仍然建立嗎？",
+        "Bridge every counterbore created with the Hole command in the active component instead of picking faces.": "橋接目前元件中所有由孔指令建立的沉頭孔，而不是手動選擇面。",
+    },
+    3: {
+        "Counterbore Bridging": "Counterbore Bridging",
+        "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing": "A Fusion 360 Add-in Command for optimizing counterbores for 3D printing",
+        "Counterbore Face": "Counterbore Face",
+        "Select the counterbore bottom face.": "Select the counterbore bottom face.",
+        "Angle degree": "Angle degree",
+        "Layer height": "Layer height",
+        "Number of cut": "Number of cut",
+        "Invalid shape, cant compute the inner profile": "Invalid shape, cant compute the inner profile",
+        "Cannot find inner circle": "Cannot find inner circle",
+        "Link to user parameters": "Link to user parameters",
+        "Drive the angle, angle step and gap through user parameters so they can be edited later.": "Drive the angle, angle step and gap through user parameters so they can be edited later.",
+        "All counterbore holes": "All counterbore holes",
+        "Angle mode": "Angle mode",
+        "Manual": "Manual",
+        "Auto (per face)": "Auto (per face)",
+        "Auto (shared)": "Auto (shared)",
+        "{} pairs of counterbores have interfering bridges. Create them anyway?": "{} pairs of counterbores have interfering bridges. Create them anyway?",
+        "Bridge every counterbore created with the Hole command in the active component instead of picking faces.": "Bridge every counterbore created with the Hole command in the active component instead of picking faces.",
+    },
+}
+
+def _(text, lang=3):
+    """
+    i18n localization function: returns the localized string for `text` in `lang`.
+    Defaults to English if translation not found.
+    """
+    return i18n.get(lang, {}).get(text, i18n[3].get(text, text))
@@ -0,0 +1,134 @@
+"""
+Interference check between the planned bridges of neighbouring counterbores.
+
+Bridges are planned before any feature is created: in the frame of its face plan (see
+planBridges) a bridge is the chord of the outer boundary at distance halfWidth from the
+hole center. Only the bridges of the first cut reach the outer boundary (the following
+ones are clipped by the previous strips), so they are the ones that can run into a
+neighbouring counterbore.
+
+The broad phase is a sweep and prune along x over the bounding boxes of the bridge slabs
+(the segments inflated by the clearance), the exact segment distance is only computed
+for the pairs whose boxes overlap: O(n log n + overlapping pairs) instead of O(n^2).
+"""
+
+import math
+
+
+def bridgeChords(angle_degrees, halfWidth, outerRadius=None, boundary=None):
+    """
+    the two bridge lines of a cut, as ((x0, y0), (x1, y1)) in the face frame (hole center
+    as origin), clipped by the concentric circle outerRadius or by the boundary segments
+    (halfWidth, outerRadius and boundary of the face plan). Lines that do not reach the
+    boundary on both sides are left out.
+    """
+    angle = math.radians(angle_degrees)
+    dx = math.cos(angle)
+    dy = math.sin(angle)
+
+    chords = []
+    for offset in (halfWidth, -halfWidth):
+        ox = -offset * dy
+        oy = offset * dx
+        if outerRadius is not None:
+            if abs(offset) >= outerRadius:
+                continue
+            forward = backward = math.sqrt(outerRadius**2 - offset**2)
+        else:
+            forward = backward = math.inf
+            for (x0, y0), (x1, y1) in boundary:
+                # distance across the line of the segment end points
+                v0 = -(x0 - ox) * dy + (y0 - oy) * dx
+                v1 = -(x1 - ox) * dy + (y1 - oy) * dx
+                if (v0 > 0) == (v1 > 0):
+                    continue
+                t0 = (x0 - ox) * dx + (y0 - oy) * dy
+                t1 = (x1 - ox) * dx + (y1 - oy) * dy
+                t = t0 + (0 - v0) * (t1 - t0) / (v1 - v0)
+                if t >= 0:
+                    forward = min(forward, t)
+                else:
+                    backward = min(backward, -t)
+            if math.isinf(forward) or math.isinf(backward):
+                continue
+        chords.append(
+            ((ox - backward * dx, oy - backward * dy), (ox + forward * dx, oy + forward * dy))
+        )
+    return chords
+
+
+def segmentDistance(p0, p1, q0, q1):
+    """
+    minimum distance between the 3D segments p0-p1 and q0-q1
+    """
+    d1 = [b - a for a, b in zip(p0, p1)]
+    d2 = [b - a for a, b in zip(q0, q1)]
+    r = [a - b for a, b in zip(p0, q0)]
+    a = sum(c * c for c in d1)
+    e = sum(c * c for c in d2)
+    f = sum(c1 * c2 for c1, c2 in zip(d2, r))
+
+    if a <= 1e-12 and e <= 1e-12:
+        s = t = 0.0
+    elif a <= 1e-12:
+        s = 0.0
+        t = min(max(f / e, 0.0), 1.0)
+    else:
+        c = sum(c1 * c2 for c1, c2 in zip(d1, r))
+        if e <= 1e-12:
+            t = 0.0
+            s = min(max(-c / a, 0.0), 1.0)
+        else:
+            b = sum(c1 * c2 for c1, c2 in zip(d1, d2))
+            denominator = a * e - b * b
+            s = min(max((b * f - c * e) / denominator, 0.0), 1.0) if denominator > 1e-12 else 0.0
+            t = (b * s + f) / e
+            if t < 0:
+                t = 0.0
+                s = min(max(-c / a, 0.0), 1.0)
+            elif t > 1:
+                t = 1.0
+                s = min(max((b - c) / a, 0.0), 1.0)
+
+    closest1 = [p + s * d for p, d in zip(p0, d1)]
+    closest2 = [q + t * d for q, d in zip(q0, d2)]
+    return math.dist(closest1, closest2)
+
+
+def findInterferences(slabs, clearance):
+    """
+    pairs of slabs of different owners closer than the clearance.
+
+    slabs: [(owner, (x, y, z), (x, y, z)), ...] the bridge segments in model space,
+    owner identifies the counterbore (bridges of the same counterbore never conflict)
+
+    Returns the sorted list of the (i, j) indexes (i < j) of the interfering slabs
+    """
+    half = clearance / 2
+    boxes = []
+    for i, (_owner, p0, p1) in enumerate(slabs):
+        low = tuple(min(a, b) - half for a, b in zip(p0, p1))
+        high = tuple(max(a, b) + half for a, b in zip(p0, p1))
+        boxes.append((low, high, i))
+    boxes.sort()
+
+    pairs = []
+    active = []
+    for low, high, i in boxes:
+        # drop the boxes ending before this one starts along x
+        active = [box for box in active if box[1][0] >= low[0]]
+        for otherLow, otherHigh, j in active:
+            if slabs[i][0] == slabs[j][0]:
+                continue
+            if (
+                otherLow[1] > high[1]
+                or otherHigh[1] < low[1]
+                or otherLow[2] > high[2]
+                or otherHigh[2] < low[2]
+            ):
+                continue
+            if segmentDistance(slabs[i][1], slabs[i][2], slabs[j][1], slabs[j][2]) < clearance:
+                pairs.append((min(i, j), max(i, j)))
+        active.append((low, high, i))
+
+    return sorted(pairs)
@@ -0,0 +1,14 @@
+"""
+NumPy is optional: it is not part of the Python shipped with Fusion. The modules using it
+(angleOptimizer, bridgeVerifier) return None without it and the command falls back to the
+manual angle and skips the verification.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def isAvailable():
+    return np is not None
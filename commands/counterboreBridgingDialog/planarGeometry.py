@@ -0,0 +1,92 @@
+"""
+Planar geometry used by cutOneFace, on plain (x, y) tuples in sketch coordinates.
+
+geometryUtil reads the points from the sketch and delegates the computations to these
+functions, so a geometry capture (see geometryCapture) can be replayed outside Fusion
+through exactly the same code.
+"""
+
+import math
+
+
+def directionAngle(point1, point2):
+    """
+    direction in degrees [0, 360) from point1 to point2
+    """
+    return (math.degrees(math.atan2(point2[1] - point1[1], point2[0] - point1[0])) + 360) % 360
+
+
+def nearestIntersections(start, end, points):
+    """
+    given the end points of a line and the intersections of its infinite extension with the
+    boundary curves, returns the indexes (in points) of the intersections nearest to the middle
+    of the line on the "start" and on the "end" side, None if there is none on a side
+    """
+    middle = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+
+    # direction in degrees of the line, endDirection is the opposite one
+    startDirection = round(directionAngle(start, end), 0)
+    endDirection = (startDirection + 180) % 360
+
+    startIndex = endIndex = None
+    startDistance = endDistance = math.inf
+    for i, point in enumerate(points):
+        side = round(directionAngle(point, middle), 0) % 360
+        distance = math.dist(middle, point)
+        if side == startDirection and distance < startDistance:
+            startIndex, startDistance = i, distance
+        elif side == endDirection and distance < endDistance:
+            endIndex, endDistance = i, distance
+    return startIndex, endIndex
+
+
+def circleChord(start, end, center, radius):
+    """
+    closed-form intersection of the line through start and end with the circle (center, radius).
+    Returns the two points ordered along the line, or None if the line does not cross the circle
+    """
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length = math.hypot(dx, dy)
+    if length == 0:
+        return None
+    ux = dx / length
+    uy = dy / length
+
+    # foot of the perpendicular from the center to the line
+    t = (center[0] - start[0]) * ux + (center[1] - start[1]) * uy
+    fx = start[0] + t * ux
+    fy = start[1] + t * uy
+
+    squaredDistance = (center[0] - fx) ** 2 + (center[1] - fy) ** 2
+    if squaredDistance >= radius * radius:
+        return None
+    h = math.sqrt(radius * radius - squaredDistance)
+
+    return (fx - h * ux, fy - h * uy), (fx + h * ux, fy + h * uy)
+
+
+def arcIndexContainingAngle(arcAngles, angle):
+    """
+    index of the arc covering the direction "angle" (degrees) from the center of a circular
+    boundary. arcAngles: [(startAngle, endAngle), ...] of the counterclockwise arcs, None
+    for a full circle
+    """
+    for index, arc in enumerate(arcAngles):
+        if arc is None or (angle - arc[0]) % 360 <= (arc[1] - arc[0]) % 360:
+            return index
+    return None
+
+
+def segmentsContain(segments, start, end, tolerance=0.000000001):
+    """
+    whether one of the segments [(start, end), ...] has the given end points, in either order
+    """
+    for segmentStart, segmentEnd in segments:
+        if math.dist(segmentStart, start) <= tolerance:
+            if math.dist(segmentEnd, end) <= tolerance:
+                return True
+        elif math.dist(segmentStart, end) <= tolerance:
+            if math.dist(segmentEnd, start) <= tolerance:
+                return True
+    return False
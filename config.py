@@ -10,6 +10,19 @@ import os
 # are ready to distribute it.
 DEBUG = True
 
+# Flag that enables the memory instrumentation of the commands. When True a tracemalloc
+# snapshot is taken when a command is created and when it is destroyed, and their
+# difference (top allocation sites, live event handlers and API objects) is appended
+# to memory_sessions.jsonl in MEMORY_PROFILE_FOLDER. It slows the add-in down noticeably.
+MEMORY_PROFILING = False
+MEMORY_PROFILE_FOLDER = os.path.join(os.path.dirname(__file__), 'memory_profiles')
+
+# Flag that enables the geometry capture of the bridging command. When True every execution
+# writes the geometry read from the model (face loops, intersections, profiles) to a
+# fixture in GEOMETRY_CAPTURE_FOLDER, which tools/replayCapture.py replays outside Fusion.
+GEOMETRY_CAPTURE = False
+GEOMETRY_CAPTURE_FOLDER = os.path.join(os.path.dirname(__file__), 'geometry_captures')
+
 # Gets the name of the add-in from the name of the folder the py file is in.
 # This is used when defining unique internal names for various UI elements 
 # that need a unique name. It's also recommended to use a company name as 
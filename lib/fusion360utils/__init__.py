@@ -1,2 +1,3 @@
 from .general_utils import *
 from .event_utils import *
+from .memory_utils import *
@@ -0,0 +1,102 @@
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from .general_utils import log
+from . import event_utils
+
+# Attempt to read the memory profiling settings from parent config.
+try:
+    from ... import config
+    MEMORY_PROFILING = config.MEMORY_PROFILING
+    MEMORY_PROFILE_FOLDER = config.MEMORY_PROFILE_FOLDER
+except:
+    MEMORY_PROFILING = False
+    MEMORY_PROFILE_FOLDER = ''
+
+# Number of allocation sites written for every session.
+TOP_ALLOCATIONS = 25
+
+# Snapshots taken at the start of the sessions that are still open, by session name.
+_sessions = {}
+
+
+def start_memory_session(name: str):
+    """Takes a tracemalloc snapshot marking the start of a session (i.e. a command run).
+    Does nothing unless MEMORY_PROFILING is set in config.
+
+    Arguments:
+    name -- A name identifying the session, the same must be passed to end_memory_session.
+    """
+    if not MEMORY_PROFILING:
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _sessions[name] = (time.time(), tracemalloc.take_snapshot())
+
+
+def end_memory_session(name: str, local_handler_count: int = None):
+    """Collects the garbage, takes a snapshot at the end of a session and appends its difference
+    with the start snapshot, together with the live handler and API proxy counts, to
+    memory_sessions.jsonl in MEMORY_PROFILE_FOLDER. Memory retained across sessions shows up
+    as growing sizes, so the command must drop its own references (handlers, cached state)
+    before calling this.
+
+    Arguments:
+    name -- The name passed to start_memory_session.
+    local_handler_count -- The number of handlers the command held before releasing them.
+
+    :returns:
+        The recorded session as a dictionary, or None if no session was started.
+    """
+    if not MEMORY_PROFILING or name not in _sessions:
+        return None
+
+    started, start_snapshot = _sessions.pop(name)
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    differences = snapshot.compare_to(start_snapshot, 'lineno')
+
+    current, peak = tracemalloc.get_traced_memory()
+    session = {
+        'name': name,
+        'started': started,
+        'duration': time.time() - started,
+        'traced_memory': current,
+        'peak_memory': peak,
+        'size_diff': sum(d.size_diff for d in differences),
+        'top_allocations': [
+            {
+                'location': f'{d.traceback[0].filename}:{d.traceback[0].lineno}',
+                'size_diff': d.size_diff,
+                'count_diff': d.count_diff,
+            }
+            for d in differences[:TOP_ALLOCATIONS]
+        ],
+        'global_handlers': len(event_utils._handlers),
+        'local_handlers': local_handler_count,
+        'proxies': count_api_objects(),
+    }
+
+    os.makedirs(MEMORY_PROFILE_FOLDER, exist_ok=True)
+    with open(os.path.join(MEMORY_PROFILE_FOLDER, 'memory_sessions.jsonl'), 'a') as f:
+        f.write(json.dumps(session) + '\n')
+
+    log(f'{name} memory session: {session["size_diff"] / 1024:.1f} KiB retained, '
+        f'{session["global_handlers"]} global handlers, {sum(session["proxies"].values())} API objects alive')
+    return session
+
+
+def count_api_objects():
+    """Counts the live Python objects wrapping Fusion API objects (adsk.* types), by type name.
+    """
+    counts = {}
+    for obj in gc.get_objects():
+        module = type(obj).__module__
+        if module.startswith('adsk.'):
+            type_name = f'{module}.{type(obj).__name__}'
+            counts[type_name] = counts.get(type_name, 0) + 1
+    return counts
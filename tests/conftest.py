@@ -0,0 +1,12 @@
+"""
+The tests run outside Fusion: the command package is imported on its own (its modules
+not using the Fusion API), the same way tools/replayCapture.py does, and the tools as
+top level modules.
+"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "commands"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
@@ -0,0 +1,81 @@
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from counterboreBridgingDialog import angleOptimizer  # noqa: E402
+from counterboreBridgingDialog import interference  # noqa: E402
+
+
+def polygonFace(points, halfWidth, token=None):
+    return {
+        "halfWidth": halfWidth,
+        "outerRadius": None,
+        "boundary": [(points[i], points[(i + 1) % len(points)]) for i in range(len(points))],
+        "token": token,
+    }
+
+
+def randomFace(seed, count=24):
+    rnd = random.Random(seed)
+    points = []
+    for k in range(count):
+        angle = 2 * math.pi * k / count
+        radius = rnd.uniform(0.45, 0.8)
+        points.append((radius * math.cos(angle) + 0.03, radius * math.sin(angle) - 0.02))
+    return polygonFace(points, rnd.uniform(0.1, 0.3))
+
+
+def rectangle(width, height, halfWidth, token=None):
+    w, h = width / 2, height / 2
+    return polygonFace([(-w, -h), (w, -h), (w, h), (-w, h)], halfWidth, token)
+
+
+def test_bridgeSpansMatchBridgeChords():
+    # every angle of every face against the chords computed one by one
+    faces = [randomFace(seed) for seed in range(6)]
+    angles = list(range(0, 180, 7)) + [12.5]
+    spans = angleOptimizer.bridgeSpans(faces, angles)
+    for i, face in enumerate(faces):
+        for j, angle in enumerate(angles):
+            chords = interference.bridgeChords(angle, face["halfWidth"], boundary=face["boundary"])
+            if len(chords) < 2:
+                assert math.isinf(spans[i, j])
+            else:
+                longest = max(math.dist(*chord) for chord in chords)
+                assert spans[i, j] == pytest.approx(longest)
+
+
+def test_bridgeSpansLineMissingTheBoundary():
+    spans = angleOptimizer.bridgeSpans([rectangle(2, 1, 0.6)], [0, 90])
+    assert math.isinf(spans[0, 0])
+    assert spans[0, 1] == pytest.approx(1.0)
+
+
+def test_bestAnglesBridgesTheShortSide():
+    faces = [rectangle(2, 1, 0.2), rectangle(1, 2, 0.2)]
+    assert angleOptimizer.bestAngles(faces) == [90.0, 0.0]
+
+
+def test_bestAnglesShared():
+    faces = [rectangle(2, 1, 0.2), rectangle(3, 1.2, 0.2)]
+    assert angleOptimizer.bestAngles(faces, shared=True) == [90.0, 90.0]
+
+
+def test_bestAnglesSkipsConcentricFaces():
+    faces = [{"halfWidth": 0.2, "outerRadius": 0.5, "boundary": None}, rectangle(2, 1, 0.2)]
+    assert angleOptimizer.bestAngles(faces) == [None, 90.0]
+
+
+def test_bestAnglesCache():
+    cache = {}
+    face = rectangle(2, 1, 0.2, token="face")
+    assert angleOptimizer.bestAngles([face], cache=cache) == [90.0]
+    assert list(cache) == [("face", 0.2)]
+
+    # the cached spans are used instead of the boundary
+    cached = dict(face, boundary=rectangle(1, 2, 0.2)["boundary"])
+    assert angleOptimizer.bestAngles([cached], cache=cache) == [90.0]
+    assert angleOptimizer.bestAngles([cached]) == [0.0]
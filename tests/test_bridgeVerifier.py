@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from counterboreBridgingDialog import bridgeVerifier  # noqa: E402
+
+
+def concentricPlan(outerRadius, halfWidth=0.2001, angles=(0, 90)):
+    return {
+        "center": (0.0, 0.0),
+        "innerRadius": 0.2,
+        "halfWidth": halfWidth,
+        "outerRadius": outerRadius,
+        "boundary": None,
+        "angles": list(angles),
+    }
+
+
+def test_subCellRadiusChangeKeepsTheLongestSpan():
+    # the rows of the grid fall differently for each radius, the gap between the hole and
+    # the bridge lines (0.0001 cm) is seen or not by the rows of the last layer
+    reports = [
+        bridgeVerifier.verifyBridgePlan(concentricPlan(outerRadius))
+        for outerRadius in (0.400, 0.4003, 0.4007, 0.401)
+    ]
+    spans = {report["maxUnsupportedSpan"] for report in reports}
+    assert len(spans) == 1
+    assert all(report["layers"][-1]["maxUnsupportedSpan"] == 0 for report in reports)
+
+
+def test_firstLayerSpanIsTheChordAlongTheStripEdge():
+    report = bridgeVerifier.verifyBridgePlan(concentricPlan(0.5))
+    chord = 2 * (0.5**2 - 0.2001**2) ** 0.5
+    assert report["layers"][0]["maxUnsupportedSpan"] == pytest.approx(chord, abs=0.02)
+
+
+def test_squareBoundaryMatchesTheCircleRasterization():
+    # a polygon boundary goes through the scanline rasterization
+    side = 0.45
+    corners = [(-side, -side), (side, -side), (side, side), (-side, side)]
+    plan = concentricPlan(None, angles=(0, 90))
+    plan["boundary"] = [(corners[i], corners[(i + 1) % 4]) for i in range(4)]
+    report = bridgeVerifier.verifyBridgePlan(plan)
+    # first layer: the bridges outside the first strip span the whole square
+    assert report["layers"][0]["maxUnsupportedSpan"] == pytest.approx(2 * side, abs=0.02)
+    assert report["layers"][-1]["maxUnsupportedSpan"] == 0
+
+
+def test_noAnglesNoReport():
+    assert bridgeVerifier.verifyBridgePlan(concentricPlan(0.4, angles=())) is None
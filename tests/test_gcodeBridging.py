@@ -0,0 +1,158 @@
+import math
+
+import pytest
+
+import gcodeBridging
+
+LAYER_HEIGHT = 0.2
+E_PER_MM = 0.03
+
+
+def circle(cx, cy, radius, count=36):
+    """
+    closed polyline of a circle (the first point is repeated at the end)
+    """
+    angles = [2 * math.pi * k / count for k in range(count + 1)]
+    return [(cx + radius * math.cos(a), cy + radius * math.sin(a)) for a in angles]
+
+
+def syntheticGcode(relative):
+    """
+    a cylinder (radius 15 mm) with a counterbore (radius 5 mm, 3 layers deep) and a hole
+    (radius 2 mm), printed with the counterbore facing the bed. The layers above the
+    counterbore have infill lines crossing it, some of them ending inside it. Extrusions run
+    at F1500 and travels at F9000, but for one travel using the current feedrate.
+    Every line is tagged with its number in a comment (";#n").
+    """
+    lines = ["G90", "M83" if relative else "M82", "G92 E0"]
+    state = {"e": 0.0, "position": (0.0, 0.0)}
+
+    def extrude(x, y):
+        length = math.dist(state["position"], (x, y))
+        state["position"] = (x, y)
+        state["e"] += length * E_PER_MM
+        e = length * E_PER_MM if relative else state["e"]
+        lines.append(f"G1 X{x:.3f} Y{y:.3f} E{e:.5f}")
+
+    def travel(x, y, feedrate=9000):
+        state["position"] = (x, y)
+        lines.append(f"G0 X{x:.3f} Y{y:.3f}" + (f" F{feedrate}" if feedrate else ""))
+        lines.append("G1 F1500")
+
+    for layer in range(8):
+        z = (layer + 1) * LAYER_HEIGHT
+        lines.append(f"G0 Z{z:.2f}")
+        holeRadius = 5.0 if layer < 3 else 2.0
+        for radius in (holeRadius, 15.0):
+            points = circle(0.0, 0.0, radius)
+            travel(*points[0])
+            for point in points[1:]:
+                extrude(*point)
+        if layer >= 3:
+            for y in (-9.0, -3.0, 3.0):
+                half = math.sqrt(14**2 - y**2)
+                travel(-half, y)
+                extrude(half, y)
+            # infill lines ending inside the counterbore, followed by a move and a travel
+            # at the current feedrate
+            travel(-13.0, 0.5)
+            extrude(0.0, 0.5)
+            extrude(13.0, 0.5)
+            travel(-13.0, 3.5)
+            extrude(0.0, 3.5)
+            travel(0.0, 10.0, feedrate=None)
+            extrude(5.0, 10.0)
+    return [f"{line} ;#{n}" for n, line in enumerate(lines)]
+
+
+def simulate(lines):
+    """
+    interprets the lines, returns {tag: (extruded length, feedrate, x, y)} for the tagged
+    lines and the extrusion mode at the end
+    """
+    absoluteE = True
+    e = 0.0
+    feedrate = None
+    x = y = 0.0
+    states = {}
+    for line in lines:
+        code, _sep, comment = line.partition(";")
+        words = code.split()
+        extruded = 0.0
+        if words:
+            command = words[0]
+            params = {word[0]: float(word[1:]) for word in words[1:]}
+            if command == "M82":
+                absoluteE = True
+            elif command == "M83":
+                absoluteE = False
+            elif command == "G92":
+                e = params.get("E", e)
+            elif command in ("G0", "G1"):
+                feedrate = params.get("F", feedrate)
+                x = params.get("X", x)
+                y = params.get("Y", y)
+                if "E" in params:
+                    extruded = params["E"] - e if absoluteE else params["E"]
+                    e = params["E"] if absoluteE else e + params["E"]
+        if comment.startswith("#"):
+            states[comment] = (extruded, feedrate, x, y)
+    return states, absoluteE
+
+
+@pytest.mark.parametrize("relative", [False, True])
+def test_bridgedFileKeepsExtrusionAndFeedrate(relative):
+    source = syntheticGcode(relative)
+    bridger = gcodeBridging.Bridger(numberOfCut=2, layerHeight=LAYER_HEIGHT)
+    output = list(bridger.process(source))
+
+    assert sum("counterbore bridging: start" in line for line in output) == 2
+    assert any("counterbore bridging: removed" in line for line in output)
+
+    expected, expectedMode = simulate(source)
+    states, mode = simulate(output)
+    assert mode == expectedMode
+    # the original lines left in the file extrude the same, at the same feedrate: E and
+    # the extrusion mode are restored after every clipped move and bridge block
+    assert len(states) < len(expected)
+    for tag, (extruded, feedrate, x, y) in states.items():
+        expectedExtruded, expectedFeedrate, expectedX, expectedY = expected[tag]
+        assert extruded == pytest.approx(expectedExtruded, abs=2e-5), tag
+        assert feedrate == expectedFeedrate, tag
+        assert (x, y) == pytest.approx((expectedX, expectedY), abs=1e-3), tag
+
+
+def test_clippedMoveKeepsTheWall():
+    bridger = gcodeBridging.Bridger(lineWidth=0.4)
+    counterbore = (0.0, 0.0, 2.0, 5.0)
+    extrusion = ((-10.0, 0.0), (10.0, 0.0), 1.0, 1.6, 1500)
+    t0, t1 = bridger._insideInterval(extrusion, counterbore)
+    limit = 5.0 - 0.4 / 4
+    assert -10 + 20 * t0 == pytest.approx(-limit)
+    assert -10 + 20 * t1 == pytest.approx(limit)
+
+    lines = list(bridger._clippedMove(extrusion, (t0, t1)))
+    assert lines[0].startswith("G1 ") and lines[1].startswith("G0 ")
+    # absolute extrusion: E is set where the original move would be at the end of the travel
+    assert lines[2] == f"G92 E{1.0 + t1 * 0.6:.5f}"
+    assert lines[3].endswith("E1.60000 F1500")
+
+
+def test_bridgeSegmentsAvoidTheRemovedStrips():
+    counterbore = (0.0, 0.0, 2.0, 5.0)
+    angles = [0.0, math.pi / 2]
+    for layer in (1, 2):
+        segments = gcodeBridging.bridgeSegments(counterbore, angles, layer, 0.45, 0.0)
+        assert segments
+        for start, end in segments:
+            for x, y in (start, end):
+                assert math.hypot(x, y) <= 5.0
+            middle = ((start[0] + end[0]) / 2, (start[1] + end[1]) / 2)
+            # the middle of a bridge is never inside the removed square
+            assert max(abs(middle[0]), abs(middle[1])) >= 2.0 - 1e-6
+
+
+def test_fitCircle():
+    cx, cy, radius = gcodeBridging.fitCircle(circle(1.0, -2.0, 3.0)[:-1])
+    assert (cx, cy, radius) == pytest.approx((1.0, -2.0, 3.0), abs=1e-6)
+    assert gcodeBridging.fitCircle([(0, 0), (1, 0), (2, 0)] * 4) is None
@@ -0,0 +1,81 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from counterboreBridgingDialog import interference
+
+
+def sampledDistance(p0, p1, q0, q1, steps=200):
+    """
+    distance between two segments sampled on a grid of their parameters
+    """
+    best = math.inf
+    for i in range(steps + 1):
+        a = [u + i / steps * (v - u) for u, v in zip(p0, p1)]
+        for j in range(steps + 1):
+            b = [u + j / steps * (v - u) for u, v in zip(q0, q1)]
+            best = min(best, math.dist(a, b))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_segmentDistanceMatchesSampling(seed):
+    rnd = random.Random(seed)
+    p0, p1, q0, q1 = [tuple(rnd.uniform(-1, 1) for _ in range(3)) for _ in range(4)]
+    assert interference.segmentDistance(p0, p1, q0, q1) == pytest.approx(
+        sampledDistance(p0, p1, q0, q1), abs=0.02
+    )
+
+
+def test_segmentDistanceDegenerate():
+    assert interference.segmentDistance((0, 0, 0), (0, 0, 0), (1, 0, 0), (1, 0, 0)) == 1
+    assert interference.segmentDistance((0, 0, 0), (2, 0, 0), (1, 1, 0), (1, 1, 0)) == 1
+    # parallel segments
+    assert interference.segmentDistance(
+        (0, 0, 0), (1, 0, 0), (0.5, 0.5, 0), (2, 0.5, 0)
+    ) == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_findInterferencesMatchesBruteForce(seed):
+    rnd = random.Random(seed)
+    slabs = []
+    for owner in range(30):
+        x, y = rnd.uniform(0, 10), rnd.uniform(0, 10)
+        for _ in range(2):
+            angle = rnd.uniform(0, math.pi)
+            length = rnd.uniform(0.2, 1.5)
+            dx, dy = length * math.cos(angle), length * math.sin(angle)
+            z = rnd.choice((0.0, 0.0, 0.3))
+            slabs.append((owner, (x - dx, y - dy, z), (x + dx, y + dy, z)))
+    clearance = 0.3
+
+    expected = [
+        (i, j)
+        for i, j in itertools.combinations(range(len(slabs)), 2)
+        if slabs[i][0] != slabs[j][0]
+        and interference.segmentDistance(slabs[i][1], slabs[i][2], slabs[j][1], slabs[j][2])
+        < clearance
+    ]
+    assert interference.findInterferences(slabs, clearance) == expected
+
+
+def test_bridgeChordsOfConcentricCircle():
+    chords = interference.bridgeChords(0, 0.2, outerRadius=0.5)
+    assert len(chords) == 2
+    for (x0, y0), (x1, y1) in chords:
+        assert abs(y0) == pytest.approx(0.2)
+        assert y0 == pytest.approx(y1)
+        assert math.hypot(x0, y0) == pytest.approx(0.5)
+        assert math.hypot(x1, y1) == pytest.approx(0.5)
+
+
+def test_bridgeChordsOfBoundary():
+    corners = [(-1, -0.5), (1, -0.5), (1, 0.5), (-1, 0.5)]
+    boundary = [(corners[i], corners[(i + 1) % 4]) for i in range(4)]
+    chords = interference.bridgeChords(90, 0.2, boundary=boundary)
+    assert sorted(round(math.dist(*chord), 9) for chord in chords) == [1.0, 1.0]
+    # a line missing the boundary is left out
+    assert interference.bridgeChords(0, 0.6, boundary=boundary) == []
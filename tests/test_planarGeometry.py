@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+from counterboreBridgingDialog import planarGeometry
+
+
+def test_directionAngle():
+    assert planarGeometry.directionAngle((0, 0), (1, 0)) == 0
+    assert planarGeometry.directionAngle((0, 0), (0, 1)) == pytest.approx(90)
+    assert planarGeometry.directionAngle((0, 0), (0, -1)) == pytest.approx(270)
+    assert planarGeometry.directionAngle((1, 1), (0, 1)) == pytest.approx(180)
+
+
+def test_nearestIntersectionsOnBothSides():
+    # the line goes from (-1, 0) to (1, 0), its middle is the origin
+    points = [(3, 0), (-2, 0), (1.5, 0), (-4, 0)]
+    startIndex, endIndex = planarGeometry.nearestIntersections((-1, 0), (1, 0), points)
+    assert points[startIndex] == (-2, 0)
+    assert points[endIndex] == (1.5, 0)
+
+
+def test_nearestIntersectionsMissingSide():
+    assert planarGeometry.nearestIntersections((-1, 0), (1, 0), [(2, 0)]) == (None, 0)
+    assert planarGeometry.nearestIntersections((-1, 0), (1, 0), []) == (None, None)
+
+
+def test_circleChord():
+    center = (1.0, 2.0)
+    chord = planarGeometry.circleChord((-5, 2.5), (5, 2.5), center, 1.0)
+    assert chord is not None
+    for x, y in chord:
+        assert math.dist((x, y), center) == pytest.approx(1.0)
+        assert y == pytest.approx(2.5)
+    # ordered along the line
+    assert chord[0][0] < chord[1][0]
+
+
+def test_circleChordMisses():
+    assert planarGeometry.circleChord((-5, 3), (5, 3), (0, 0), 1.0) is None
+    assert planarGeometry.circleChord((1, 1), (1, 1), (0, 0), 2.0) is None
+
+
+def test_arcIndexContainingAngle():
+    arcs = [(350, 10), (10, 180), (180, 350)]
+    assert planarGeometry.arcIndexContainingAngle(arcs, 0) == 0
+    assert planarGeometry.arcIndexContainingAngle(arcs, 90) == 1
+    assert planarGeometry.arcIndexContainingAngle(arcs, 270) == 2
+    assert planarGeometry.arcIndexContainingAngle([None], 123) == 0
+    assert planarGeometry.arcIndexContainingAngle([(0, 90)], 180) is None
+
+
+def test_segmentsContain():
+    segments = [((0, 0), (1, 0)), ((1, 0), (1, 1))]
+    assert planarGeometry.segmentsContain(segments, (1, 0), (0, 0))
+    assert planarGeometry.segmentsContain(segments, (1, 0), (1, 1))
+    assert not planarGeometry.segmentsContain(segments, (0, 0), (1, 1))
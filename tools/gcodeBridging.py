@@ -0,0 +1,465 @@
+"""
+Counterbore bridging for already sliced G-code.
+
+Applies the strategy of the Fusion command (see cutOneFace) at slice time: the first
+`number_of_cut` layers printed over a counterbore are replaced by bridge lines, rotated
+by 180 / number_of_cut at every layer, leaving free the intersection of the strips of
+half width hole radius + gap, exactly like the cuts of the add-in.
+
+Counterbores are detected in the toolpaths (part printed with the counterbore facing the
+bed): the perimeters of a layer are fitted with circles, and a counterbore step is a layer
+whose smallest circle around a center is clearly smaller than the one of the layer below.
+On the bridge layers the parts of the original moves inside the counterbore are turned into
+travels and the bridge lines are added after the last extrusion of the layer.
+
+The file is streamed: only the current layer is kept in memory, so multi-gigabyte files
+are processed in constant memory with respect to the file size.
+
+Usage:
+    python gcodeBridging.py input.gcode output.gcode [--angle 0] [--cuts 2] ...
+
+Only absolute XY positioning (G90) is rewritten, both absolute (M82) and relative (M83)
+extrusion are supported. Arc moves (G2/G3) are tracked but passed through unchanged: arc
+fitted perimeters are not recognized as circles and arcs inside a counterbore are not
+clipped, so arc fitting (ArcWelder, PrusaSlicer "Arc fitting"...) must be disabled.
+"""
+
+import argparse
+import math
+
+
+# Minimum number of points of a closed perimeter to be fitted with a circle
+MIN_CIRCLE_POINTS = 8
+# Maximum relative deviation of the point distances from the fitted radius
+CIRCLE_TOLERANCE = 0.03
+# Distance (mm) under which two circle centers are considered the same
+CENTER_TOLERANCE = 0.1
+# Travels between bridge lines longer than this (mm) are retracted
+RETRACT_MIN_TRAVEL = 1.0
+
+ARC_COMMANDS = ("G2", "G3", "G02", "G03")
+
+
+def parseMove(line):
+    """
+    returns the command ("G0"/"G1"/"G2"/"G3") and the {letter: value} parameters of a move,
+    or None if the line is not a move
+    """
+    code = line.split(";", 1)[0].split()
+    if not code or code[0] not in ("G0", "G1", "G00", "G01") + ARC_COMMANDS:
+        return None
+
+    params = {}
+    for word in code[1:]:
+        try:
+            params[word[0].upper()] = float(word[1:])
+        except ValueError:
+            pass
+    return code[0], params
+
+
+def fitCircle(points):
+    """
+    returns (cx, cy, radius) if the points lie on a circle, otherwise None
+    """
+    if len(points) < MIN_CIRCLE_POINTS:
+        return None
+
+    cx = sum(p[0] for p in points) / len(points)
+    cy = sum(p[1] for p in points) / len(points)
+    distances = [math.hypot(p[0] - cx, p[1] - cy) for p in points]
+    radius = sum(distances) / len(distances)
+    if radius == 0:
+        return None
+    if max(abs(d - radius) for d in distances) / radius > CIRCLE_TOLERANCE:
+        return None
+    return cx, cy, radius
+
+
+def smallestCircles(circles):
+    """
+    groups the concentric circles and keeps the smallest of every group (the hole boundary)
+    """
+    smallest = []
+    for cx, cy, radius in sorted(circles, key=lambda c: c[2]):
+        if not any(
+            math.hypot(cx - sx, cy - sy) < CENTER_TOLERANCE for sx, sy, _r in smallest
+        ):
+            smallest.append((cx, cy, radius))
+    return smallest
+
+
+def findCounterboreSteps(below, current, lineWidth):
+    """
+    counterbores starting at the current layer: a hole of the current layer whose circle in
+    the layer below is larger by more than two line widths.
+    Returns [(cx, cy, innerRadius, outerRadius)], radii measured on the hole walls.
+    """
+    steps = []
+    for cx, cy, r in current:
+        for bx, by, br in below:
+            if math.hypot(cx - bx, cy - by) < CENTER_TOLERANCE and br - r > 2 * lineWidth:
+                steps.append((cx, cy, r - lineWidth / 2, br - lineWidth / 2))
+    return steps
+
+
+def stripInterval(angle, halfWidth, cx, cy, ox, oy, dx, dy):
+    """
+    parameter interval of the line (ox, oy) + t (dx, dy) lying inside the strip through
+    (cx, cy) along angle, or None if the line misses it
+    """
+    nx = -math.sin(angle)
+    ny = math.cos(angle)
+    a = dx * nx + dy * ny
+    b = (ox - cx) * nx + (oy - cy) * ny
+    if abs(a) < 1e-12:
+        return (-math.inf, math.inf) if abs(b) <= halfWidth else None
+    t0 = (-halfWidth - b) / a
+    t1 = (halfWidth - b) / a
+    return min(t0, t1), max(t0, t1)
+
+
+def bridgeSegments(counterbore, angles, layer, lineWidth, gap):
+    """
+    bridge lines of the given layer (1..len(angles)) of the counterbore: lines along the layer
+    angle filling the counterbore minus the intersection of the strips of the first `layer` cuts
+    """
+    cx, cy, innerRadius, outerRadius = counterbore
+    angle = angles[layer - 1]
+    dx = math.cos(angle)
+    dy = math.sin(angle)
+    halfWidth = innerRadius + gap
+
+    segments = []
+    offset = -outerRadius + lineWidth / 2
+    while offset < outerRadius - lineWidth / 2 + 1e-9:
+        ox = cx - offset * dy
+        oy = cy + offset * dx
+        h = math.sqrt(max(outerRadius**2 - offset**2, 0)) - lineWidth / 2
+        if h > 0:
+            # the removed region of this layer is convex: intersect the strip intervals
+            removed = (-math.inf, math.inf)
+            for a in angles[:layer]:
+                interval = stripInterval(a, halfWidth, cx, cy, ox, oy, dx, dy)
+                if interval is None:
+                    removed = None
+                    break
+                removed = (max(removed[0], interval[0]), min(removed[1], interval[1]))
+
+            pieces = [(-h, h)]
+            if removed is not None and removed[0] < removed[1]:
+                pieces = [(-h, min(h, removed[0])), (max(-h, removed[1]), h)]
+            for t0, t1 in pieces:
+                if t1 - t0 > lineWidth:
+                    segments.append(
+                        ((ox + t0 * dx, oy + t0 * dy), (ox + t1 * dx, oy + t1 * dy))
+                    )
+        offset += lineWidth
+
+    # alternate the direction to avoid long travels
+    return [s if i % 2 == 0 else (s[1], s[0]) for i, s in enumerate(segments)]
+
+
+class Layer:
+    """
+    buffered lines of one layer with the perimeters found in it
+    """
+
+    def __init__(self, z):
+        self.z = z
+        self.lines = []
+        self.circles = []
+        self.polyline = []
+        # index of the line after the last extrusion and E (absolute), position and
+        # feedrate at that point
+        self.insertAt = 0
+        self.eAtInsert = 0.0
+        self.positionAtInsert = None
+        self.feedrateAtInsert = None
+
+    def markInsert(self, e, position, feedrate):
+        self.insertAt = len(self.lines)
+        self.eAtInsert = e
+        self.positionAtInsert = position
+        self.feedrateAtInsert = feedrate
+
+    def closePolyline(self):
+        points = self.polyline
+        if len(points) > 1 and math.hypot(
+            points[0][0] - points[-1][0], points[0][1] - points[-1][1]
+        ) < CENTER_TOLERANCE:
+            circle = fitCircle(points[:-1])
+            if circle is not None:
+                self.circles.append(circle)
+        self.polyline = []
+
+
+class Bridger:
+    """
+    streaming G-code rewriter, see the module docstring
+    """
+
+    def __init__(
+        self,
+        angle=0.0,
+        numberOfCut=2,
+        layerHeight=0.2,
+        lineWidth=0.45,
+        filamentDiameter=1.75,
+        gap=0.001,
+        bridgeFeedrate=1800,
+        travelFeedrate=9000,
+        retractLength=0.8,
+        retractFeedrate=2100,
+    ):
+        self.angles = [
+            math.radians(angle + i * 180.0 / numberOfCut) for i in range(numberOfCut)
+        ]
+        self.layerHeight = layerHeight
+        self.lineWidth = lineWidth
+        self.gap = gap
+        self.bridgeFeedrate = bridgeFeedrate
+        self.travelFeedrate = travelFeedrate
+        self.retractLength = retractLength
+        self.retractFeedrate = retractFeedrate
+        self.ePerMm = (lineWidth * layerHeight) / (math.pi * (filamentDiameter / 2) ** 2)
+
+        self.x = self.y = self.z = self.e = 0.0
+        self.feedrate = None
+        self.absoluteXY = True
+        self.absoluteE = True
+        self.layer = Layer(None)
+        self.belowCircles = []
+        # [counterbore, number of the next bridge layer]
+        self.active = []
+
+    def process(self, lines):
+        """
+        generator of the rewritten lines
+        """
+        for line in lines:
+            line = line.rstrip("\r\n")
+            yield from self._feed(line)
+        yield from self._flush()
+
+    def _feed(self, line):
+        code = line.split(";", 1)[0].strip().upper()
+        if code.startswith("G90"):
+            self.absoluteXY = True
+        elif code.startswith("G91"):
+            self.absoluteXY = False
+        elif code.startswith("M82"):
+            self.absoluteE = True
+        elif code.startswith("M83"):
+            self.absoluteE = False
+        elif code.startswith("G92"):
+            move = parseMove("G1" + code[3:])
+            if move is not None and "E" in move[1]:
+                self.e = move[1]["E"]
+
+        move = parseMove(line)
+        if move is None:
+            self.layer.lines.append((line, None))
+            return
+
+        command, params = move
+        start = (self.x, self.y)
+        if self.absoluteXY:
+            self.x = params.get("X", self.x)
+            self.y = params.get("Y", self.y)
+            self.z = params.get("Z", self.z)
+        else:
+            self.x += params.get("X", 0.0)
+            self.y += params.get("Y", 0.0)
+            self.z += params.get("Z", 0.0)
+
+        eBefore = self.e
+        if "F" in params:
+            self.feedrate = params["F"]
+        extrudes = False
+        if "E" in params:
+            extrudes = params["E"] > self.e if self.absoluteE else params["E"] > 0
+            self.e = params["E"] if self.absoluteE else self.e + params["E"]
+        extrudes = extrudes and (self.x, self.y) != start
+
+        # a layer starts with the first extrusion at a new height
+        if extrudes and (self.layer.z is None or abs(self.z - self.layer.z) > 1e-4):
+            yield from self._flush()
+            self.layer = Layer(self.z)
+
+        layer = self.layer
+        if extrudes and command not in ARC_COMMANDS:
+            if not layer.polyline:
+                layer.polyline = [start]
+            layer.polyline.append((self.x, self.y))
+            layer.lines.append(
+                (line, (start, (self.x, self.y), eBefore, self.e, self.feedrate))
+            )
+            layer.markInsert(self.e, (self.x, self.y), self.feedrate)
+        elif extrudes:
+            # arcs only move the insertion point, they are never clipped
+            layer.closePolyline()
+            layer.lines.append((line, None))
+            layer.markInsert(self.e, (self.x, self.y), self.feedrate)
+        else:
+            layer.closePolyline()
+            layer.lines.append((line, None))
+
+    def _flush(self):
+        layer = self.layer
+        layer.closePolyline()
+        circles = smallestCircles(layer.circles)
+
+        if layer.z is not None and self.absoluteXY:
+            for counterbore in findCounterboreSteps(self.belowCircles, circles, self.lineWidth):
+                self.active.append([counterbore, 1])
+
+        bridging = [a for a in self.active if a[1] <= len(self.angles)]
+        for i, (line, extrusion) in enumerate(layer.lines):
+            if i == layer.insertAt and bridging:
+                yield from self._bridgeBlock(layer, bridging)
+            interval = None
+            if extrusion is not None:
+                for counterbore, _number in bridging:
+                    interval = self._insideInterval(extrusion, counterbore)
+                    if interval is not None:
+                        break
+            if interval is not None:
+                yield from self._clippedMove(extrusion, interval)
+            else:
+                yield line
+        if layer.insertAt >= len(layer.lines) and bridging:
+            yield from self._bridgeBlock(layer, bridging)
+
+        for a in bridging:
+            a[1] += 1
+        self.active = [a for a in self.active if a[1] <= len(self.angles)]
+        self.belowCircles = circles
+
+    def _insideInterval(self, extrusion, counterbore):
+        """
+        parameter interval [t0, t1] (within [0, 1]) of the move lying inside the counterbore,
+        slightly shrunk to keep its wall, or None
+        """
+        cx, cy, _innerRadius, outerRadius = counterbore
+        limit = outerRadius - self.lineWidth / 4
+        (x0, y0), (x1, y1), _eBefore, _eAfter, _feedrate = extrusion
+        dx = x1 - x0
+        dy = y1 - y0
+        a = dx * dx + dy * dy
+        b = 2 * ((x0 - cx) * dx + (y0 - cy) * dy)
+        c = (x0 - cx) ** 2 + (y0 - cy) ** 2 - limit * limit
+        discriminant = b * b - 4 * a * c
+        if a == 0 or discriminant <= 0:
+            return None
+        root = math.sqrt(discriminant)
+        t0 = max((-b - root) / (2 * a), 0.0)
+        t1 = min((-b + root) / (2 * a), 1.0)
+        return (t0, t1) if t0 < t1 else None
+
+    def _clippedMove(self, extrusion, interval):
+        """
+        the move with the part inside the counterbore turned into a travel
+        """
+        (x0, y0), (x1, y1), eBefore, eAfter, feedrate = extrusion
+        t0, t1 = interval
+        f = f" F{feedrate:g}" if feedrate is not None else ""
+
+        def point(t):
+            return x0 + t * (x1 - x0), y0 + t * (y1 - y0)
+
+        def extrusionTo(t, fromT):
+            x, y = point(t)
+            e = eBefore + t * (eAfter - eBefore)
+            if not self.absoluteE:
+                e = (t - fromT) * (eAfter - eBefore)
+            return f"G1 X{x:.3f} Y{y:.3f} E{e:.5f}{f}"
+
+        if t0 > 0:
+            yield extrusionTo(t0, 0.0)
+        x, y = point(t1)
+        yield f"G0 X{x:.3f} Y{y:.3f} F{self.travelFeedrate} ; counterbore bridging: removed"
+        if self.absoluteE:
+            yield f"G92 E{eBefore + t1 * (eAfter - eBefore):.5f}"
+        if t1 < 1:
+            yield extrusionTo(1.0, t1)
+        elif feedrate is not None:
+            # restore the feedrate of the following moves
+            yield f"G0 F{feedrate:g}"
+
+    def _travel(self, position, target):
+        """
+        travel between two points of the bridge block (relative extrusion), retracted if long
+        """
+        x, y = target
+        retract = (
+            self.retractLength > 0
+            and position is not None
+            and math.hypot(x - position[0], y - position[1]) > RETRACT_MIN_TRAVEL
+        )
+        if retract:
+            yield f"G1 E{-self.retractLength:.5f} F{self.retractFeedrate}"
+        yield f"G0 X{x:.3f} Y{y:.3f} F{self.travelFeedrate}"
+        if retract:
+            yield f"G1 E{self.retractLength:.5f} F{self.retractFeedrate}"
+
+    def _bridgeBlock(self, layer, bridging):
+        yield "; counterbore bridging: start"
+        yield f"G0 Z{layer.z:.3f}"
+        yield "M83"
+        position = layer.positionAtInsert
+        for counterbore, number in bridging:
+            for (x0, y0), (x1, y1) in bridgeSegments(
+                counterbore, self.angles, number, self.lineWidth, self.gap
+            ):
+                yield from self._travel(position, (x0, y0))
+                length = math.hypot(x1 - x0, y1 - y0)
+                yield (
+                    f"G1 X{x1:.3f} Y{y1:.3f} E{length * self.ePerMm:.5f} "
+                    f"F{self.bridgeFeedrate}"
+                )
+                position = (x1, y1)
+        # back where the file left the printer, with its feedrate
+        if layer.positionAtInsert is not None:
+            yield from self._travel(position, layer.positionAtInsert)
+        if self.absoluteE:
+            yield "M82"
+            yield f"G92 E{layer.eAtInsert:.5f}"
+        if layer.feedrateAtInsert is not None:
+            yield f"G0 F{layer.feedrateAtInsert:g}"
+        yield "; counterbore bridging: end"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="sliced G-code")
+    parser.add_argument("output", help="rewritten G-code")
+    parser.add_argument("--angle", type=float, default=0.0, help="angle of the first bridges (degrees)")
+    parser.add_argument("--cuts", type=int, default=2, help="number of bridge layers")
+    parser.add_argument("--layer-height", type=float, default=0.2, help="layer height (mm)")
+    parser.add_argument("--line-width", type=float, default=0.45, help="extrusion width (mm)")
+    parser.add_argument("--filament-diameter", type=float, default=1.75, help="filament diameter (mm)")
+    parser.add_argument("--gap", type=float, default=0.001, help="gap between the hole and the bridges (mm)")
+    parser.add_argument("--bridge-feedrate", type=float, default=1800, help="bridge feedrate (mm/min)")
+    parser.add_argument("--retract-length", type=float, default=0.8, help="retraction of the bridge travels (mm, 0 to disable)")
+    parser.add_argument("--retract-feedrate", type=float, default=2100, help="retraction feedrate (mm/min)")
+    args = parser.parse_args()
+
+    bridger = Bridger(
+        angle=args.angle,
+        numberOfCut=args.cuts,
+        layerHeight=args.layer_height,
+        lineWidth=args.line_width,
+        filamentDiameter=args.filament_diameter,
+        gap=args.gap,
+        bridgeFeedrate=args.bridge_feedrate,
+        retractLength=args.retract_length,
+        retractFeedrate=args.retract_feedrate,
+    )
+    with open(args.input) as source, open(args.output, "w") as destination:
+        for line in bridger.process(source):
+            destination.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
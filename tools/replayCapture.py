@@ -0,0 +1,274 @@
+"""
+Replay of a geometry capture of the Fusion command outside Fusion.
+
+A capture (written when GEOMETRY_CAPTURE is set in config, see geometryCapture.py) holds the
+geometry the command read from the model. This script re-runs on it the planning and
+intersection code of the command, the same functions the add-in calls:
+
+    planning       angleOptimizer.bestAngles (auto angle modes only)
+    interference   interference.bridgeChords and findInterferences
+    closed-form    planarGeometry.circleChord and arcIndexContainingAngle (chord fast path)
+    generic        planarGeometry.nearestIntersections (generic chord path, on the captured
+                   intersections: Fusion's intersectWithCurve is not part of the replay)
+    profiles       planarGeometry.segmentsContain on the segments of every sketch profile
+    verification   bridgeVerifier.verifyBridgePlan
+
+and checks that the results match the recorded ones, so the code can be profiled and
+optimized without Fusion and with a fixed input.
+
+The per cut cost of the two chord paths measured in Fusion (intersectWithCurve included) is
+reported from the captured timings of the concentric cuts, where both paths run on the same lines.
+
+Usage:
+    python replayCapture.py capture.json.gz [--repeat 10] [--profile] [--sort cumulative]
+
+The stages needing NumPy (planning and verification) are skipped when it is not installed.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+# the command package is imported on its own, without the add-in and the Fusion API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "commands"))
+
+from counterboreBridgingDialog import angleOptimizer  # noqa: E402
+from counterboreBridgingDialog import bridgeVerifier  # noqa: E402
+from counterboreBridgingDialog import geometryCapture  # noqa: E402
+from counterboreBridgingDialog import interference  # noqa: E402
+from counterboreBridgingDialog import optionalNumpy  # noqa: E402
+from counterboreBridgingDialog import planarGeometry  # noqa: E402
+
+# Same values as in the command (see ANGLE_MODE_* in dialog.py)
+ANGLE_MODE_MANUAL = 0
+ANGLE_MODE_AUTO_SHARED = 2
+
+# Tolerance (degrees) on the replayed angles
+ANGLE_TOLERANCE = 0.000001
+
+
+def toTuples(value):
+    """
+    JSON turns tuples into lists: converts the nested lists back to tuples
+    """
+    if isinstance(value, list):
+        return tuple(toTuples(v) for v in value)
+    return value
+
+
+def replayPlanning(fixture):
+    """
+    re-runs the angle optimizer on the planned faces, returns the number of mismatches
+    (None without NumPy)
+    """
+    settings = fixture["settings"]
+    if not optionalNumpy.isAvailable():
+        return None
+    if settings["angleMode"] == ANGLE_MODE_MANUAL:
+        return 0
+
+    plans = [face["plan"] for face in fixture["faces"] if face["plan"] is not None]
+    angles = angleOptimizer.bestAngles(
+        plans, shared=settings["angleMode"] == ANGLE_MODE_AUTO_SHARED
+    )
+    mismatches = 0
+    for plan, angle in zip(plans, angles):
+        expected = angle if angle is not None else settings["manualAngle"]
+        if abs(expected - plan["angle"]) > ANGLE_TOLERANCE:
+            mismatches += 1
+    return mismatches
+
+
+def replayInterference(fixture):
+    """
+    re-runs the interference check of the first cut bridges, returns the interfering pairs
+    """
+    slabs = []
+    for i, face in enumerate(fixture["faces"]):
+        plan = face["plan"]
+        if plan is None:
+            continue
+        origin, xDirection, yDirection = plan["frame"]
+        for chord in interference.bridgeChords(
+            plan["angle"], plan["halfWidth"], plan["outerRadius"], plan["boundary"]
+        ):
+            points = [
+                tuple(o + x * u + y * v for o, u, v in zip(origin, xDirection, yDirection))
+                for x, y in chord
+            ]
+            slabs.append((i, points[0], points[1]))
+    pairs = interference.findInterferences(slabs, fixture["settings"]["clearance"])
+    return sorted({(slabs[i][0], slabs[j][0]) for i, j in pairs})
+
+
+def chordRecords(fixture, path):
+    """
+    the captured chord computations of the given path ("closedForm" or "generic")
+    """
+    return [
+        record
+        for face in fixture["faces"]
+        for cut in face["cuts"]
+        for record in cut.get(path, [])
+    ]
+
+
+def replayClosedFormChords(fixture):
+    """
+    re-runs the closed-form chord computations, returns the number of mismatches
+    """
+    mismatches = 0
+    for record in chordRecords(fixture, "closedForm"):
+        start, end = record["line"]
+        center = record["center"]
+        chord = planarGeometry.circleChord(start, end, center, record["radius"])
+        result = None
+        if chord is not None:
+            result = [
+                planarGeometry.arcIndexContainingAngle(
+                    record["arcs"], planarGeometry.directionAngle(center, point)
+                )
+                for point in chord
+            ]
+        if result != record.get("result"):
+            mismatches += 1
+    return mismatches
+
+
+def replayGenericChords(fixture):
+    """
+    re-runs the selection of the nearest intersections, returns the number of mismatches
+    """
+    mismatches = 0
+    for record in chordRecords(fixture, "generic"):
+        start, end = record["line"]
+        result = planarGeometry.nearestIntersections(start, end, record["points"])
+        if list(result) != record["result"]:
+            mismatches += 1
+    return mismatches
+
+
+def replayProfiles(fixture):
+    """
+    re-runs the search of the profile between the bridge lines, returns the number of mismatches
+    """
+    mismatches = 0
+    for face in fixture["faces"]:
+        for cut in face["cuts"]:
+            lines = cut["lines"]
+            candidates = [
+                i
+                for i, segments in enumerate(cut["profiles"])
+                if all(planarGeometry.segmentsContain(segments, *line) for line in lines)
+            ]
+            if candidates != cut["candidateProfiles"]:
+                mismatches += 1
+    return mismatches
+
+
+def replayVerification(fixture):
+    """
+    re-runs the layer stack verification, returns the largest unsupported span (cm)
+    (None without NumPy)
+    """
+    if not optionalNumpy.isAvailable():
+        return None
+
+    maxSpan = 0
+    for face in fixture["faces"]:
+        bridgePlan = face["bridgePlan"]
+        if not bridgePlan:
+            continue
+        bridgePlan = dict(bridgePlan, center=tuple(bridgePlan["center"]))
+        if bridgePlan["boundary"] is not None:
+            bridgePlan["boundary"] = toTuples(bridgePlan["boundary"])
+        report = bridgeVerifier.verifyBridgePlan(bridgePlan)
+        if report is not None:
+            maxSpan = max(maxSpan, report["maxUnsupportedSpan"])
+    return maxSpan
+
+
+STAGES = [
+    ("planning", replayPlanning),
+    ("interference", replayInterference),
+    ("closed-form", replayClosedFormChords),
+    ("generic", replayGenericChords),
+    ("profiles", replayProfiles),
+    ("verification", replayVerification),
+]
+
+
+def replay(fixture, repeat=1):
+    """
+    runs every stage repeat times, returns {stage: (seconds per run, result of the last run)}
+    """
+    timings = {}
+    for name, stage in STAGES:
+        startTime = time.perf_counter()
+        for _ in range(repeat):
+            result = stage(fixture)
+        timings[name] = ((time.perf_counter() - startTime) / repeat, result)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replays a geometry capture of the counterbore bridging command"
+    )
+    parser.add_argument("capture", help="capture file (capture_*.json.gz)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every stage")
+    parser.add_argument("--profile", action="store_true", help="profile the replay with cProfile")
+    parser.add_argument("--sort", default="cumulative", help="sort key of the profile")
+    parser.add_argument("--limit", type=int, default=30, help="functions shown in the profile")
+    args = parser.parse_args(argv)
+
+    fixture = geometryCapture.loadFixture(args.capture)
+    faces = fixture["faces"]
+    print(
+        f"{len(faces)} faces, {sum(len(face['cuts']) for face in faces)} cuts, "
+        f"settings {fixture['settings']}"
+    )
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    timings = replay(fixture, args.repeat)
+    if profiler is not None:
+        profiler.disable()
+
+    for name, (seconds, result) in timings.items():
+        if result is None:
+            print(f"{name:>12}: skipped (NumPy is not available)")
+        else:
+            print(f"{name:>12}: {seconds * 1000:9.3f} ms  {result}")
+
+    # per cut cost of the two chord paths, measured in Fusion on the cuts that ran both
+    timed = [
+        cut["seconds"]
+        for face in faces
+        for cut in face["cuts"]
+        if "closedForm" in cut.get("seconds", {}) and "generic" in cut.get("seconds", {})
+    ]
+    if timed:
+        for name, path in (("closed-form", "closedForm"), ("generic", "generic")):
+            seconds = sum(t[path] for t in timed) / len(timed)
+            print(f"{name:>12}: {seconds * 1e6:9.1f} us per cut in Fusion ({len(timed)} cuts)")
+
+    mismatches = sum(
+        timings[name][1] or 0
+        for name in ("planning", "closed-form", "generic", "profiles")
+    )
+    if mismatches:
+        print(f"{mismatches} results differ from the captured ones")
+
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats(args.sort).print_stats(args.limit)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())